@@ -3,10 +3,9 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 
 from alembic import context
-from core.api.channel_partner.models import Base
-from core.api.consumer.models import Base
-from core.api.merchant.models import Base
-from core.api.users.models import Base
+from config.base import settings
+from core.api.admin.models import Base
+from core.api.sales_person.models import Base
 from core.database.connection import Base
 from core.models.models import Base
 
@@ -19,6 +18,9 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# migrate the database the app is configured for
+config.set_main_option("sqlalchemy.url", settings.DB_URL.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
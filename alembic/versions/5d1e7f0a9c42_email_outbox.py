@@ -0,0 +1,44 @@
+"""email outbox
+
+Revision ID: 5d1e7f0a9c42
+Revises: 82ce025619b4
+Create Date: 2026-10-18 11:02:17.504121
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e7f0a9c42'
+down_revision = '82ce025619b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('email_outbox',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('to_email', sa.String(length=100), nullable=False),
+    sa.Column('subject', sa.String(length=200), nullable=True),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('action', sa.String(length=100), nullable=True),
+    sa.Column('action_url', sa.String(length=1024), nullable=True),
+    sa.Column('message1', sa.Text(), nullable=True),
+    sa.Column('message2', sa.Text(), nullable=True),
+    sa.Column('support_url', sa.String(length=1024), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_email_outbox_status_next_attempt_at', 'email_outbox', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_status_next_attempt_at', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,24 @@
+"""user_roles role_id users_id index
+
+Revision ID: 82ce025619b4
+Revises: 0aff6f0bc151
+Create Date: 2026-10-18 10:12:40.218653
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '82ce025619b4'
+down_revision = '0aff6f0bc151'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_roles_role_id_users_id', 'user_roles', ['role_id', 'users_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_roles_role_id_users_id', table_name='user_roles')
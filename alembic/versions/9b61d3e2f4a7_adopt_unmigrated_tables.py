@@ -0,0 +1,85 @@
+"""adopt unmigrated tables
+
+admin_profile, sales_person_profile, merchant_stages and
+sales_person_time_tracking were only ever created by create_all at app
+startup. They are created here when missing, so a fresh database can be
+built by Alembic alone, and left untouched where they already exist.
+
+Revision ID: 9b61d3e2f4a7
+Revises: 5d1e7f0a9c42
+Create Date: 2026-10-18 13:41:08.310274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9b61d3e2f4a7'
+down_revision = '5d1e7f0a9c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    gender = postgresql.ENUM(name='gendertype', create_type=False)
+    if not inspector.has_table('admin_profile'):
+        op.create_table('admin_profile',
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('users_id', sa.Integer(), nullable=False),
+        sa.Column('dob', sa.Date(), nullable=True),
+        sa.Column('gender', gender, nullable=False),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+        sa.Column('profile_image', sa.String(length=1024), nullable=True),
+        sa.ForeignKeyConstraint(['users_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('users_id')
+        )
+    if not inspector.has_table('sales_person_profile'):
+        op.create_table('sales_person_profile',
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('users_id', sa.Integer(), nullable=True),
+        sa.Column('dob', sa.Date(), nullable=True),
+        sa.Column('gender', gender, nullable=False),
+        sa.Column('address1', sa.String(length=100), nullable=True),
+        sa.Column('address2', sa.String(length=100), nullable=True),
+        sa.Column('city', sa.String(length=20), nullable=True),
+        sa.Column('district', sa.String(length=20), nullable=True),
+        sa.Column('state', sa.String(length=20), nullable=True),
+        sa.Column('country', sa.String(length=20), nullable=True),
+        sa.Column('postal_code', sa.String(length=20), nullable=True),
+        sa.Column('profile_image', sa.String(length=1024), nullable=True),
+        sa.Column('designation', sa.String(length=30), nullable=True),
+        sa.ForeignKeyConstraint(['users_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('users_id')
+        )
+    if not inspector.has_table('merchant_stages'):
+        op.create_table('merchant_stages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stage_name', sa.String(length=30), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not inspector.has_table('sales_person_time_tracking'):
+        op.create_table('sales_person_time_tracking',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('users_id', sa.Integer(), nullable=True),
+        sa.Column('date', sa.Date(), nullable=True),
+        sa.Column('log_in_time', sa.Time(), nullable=True),
+        sa.Column('log_out_time', sa.Time(), nullable=True),
+        sa.Column('active_login_time', sa.Time(), nullable=True),
+        sa.Column('active', sa.String(length=10), nullable=True),
+        sa.ForeignKeyConstraint(['users_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade() -> None:
+    # the tables may predate this revision, dropping them would lose data
+    pass
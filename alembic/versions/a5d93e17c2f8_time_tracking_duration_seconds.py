@@ -0,0 +1,25 @@
+"""time tracking duration seconds
+
+Revision ID: a5d93e17c2f8
+Revises: f2c6a8d4b190
+Create Date: 2026-10-18 18:55:31.640227
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5d93e17c2f8'
+down_revision = 'f2c6a8d4b190'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing rows are filled by python -m core.utils.activity_rollup
+    op.add_column('sales_person_time_tracking', sa.Column('duration_seconds', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sales_person_time_tracking', 'duration_seconds')
@@ -0,0 +1,52 @@
+"""time tracking active boolean and indexes
+
+Revision ID: b7e41c9a3d05
+Revises: a5d93e17c2f8
+Create Date: 2026-10-18 19:37:12.508164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e41c9a3d05'
+down_revision = 'a5d93e17c2f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # only the newest open session of a user can still be ended, close the
+    # older ones so at most one open session per user is left
+    op.execute("""
+        UPDATE sales_person_time_tracking SET active = 'false'
+        WHERE active = 'true' AND id NOT IN (
+            SELECT max(id) FROM sales_person_time_tracking WHERE active = 'true' GROUP BY users_id
+        )
+    """)
+    op.execute("UPDATE sales_person_time_tracking SET active = 'false' WHERE active IS NULL OR active <> 'true'")
+    op.alter_column('sales_person_time_tracking', 'active',
+               existing_type=sa.String(length=10),
+               type_=sa.Boolean(),
+               postgresql_using="active = 'true'")
+    op.alter_column('sales_person_time_tracking', 'active',
+               existing_type=sa.Boolean(),
+               nullable=False,
+               server_default=sa.false())
+    op.create_index('ix_sales_person_time_tracking_users_id_date', 'sales_person_time_tracking', ['users_id', 'date'], unique=False)
+    op.create_index('ux_sales_person_time_tracking_open', 'sales_person_time_tracking', ['users_id'], unique=True,
+                    postgresql_where=sa.text('active'), sqlite_where=sa.text('active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ux_sales_person_time_tracking_open', table_name='sales_person_time_tracking')
+    op.drop_index('ix_sales_person_time_tracking_users_id_date', table_name='sales_person_time_tracking')
+    op.alter_column('sales_person_time_tracking', 'active',
+               existing_type=sa.Boolean(),
+               nullable=True,
+               server_default=None)
+    op.alter_column('sales_person_time_tracking', 'active',
+               existing_type=sa.Boolean(),
+               type_=sa.String(length=10),
+               postgresql_using="CASE WHEN active THEN 'true' ELSE 'false' END")
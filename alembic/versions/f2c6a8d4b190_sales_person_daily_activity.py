@@ -0,0 +1,35 @@
+"""sales person daily activity
+
+Revision ID: f2c6a8d4b190
+Revises: e83b5c1f0d26
+Create Date: 2026-10-18 17:42:09.113578
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6a8d4b190'
+down_revision = 'e83b5c1f0d26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sales_person_daily_activity',
+    sa.Column('users_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('active_seconds', sa.Integer(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['users_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('users_id', 'date')
+    )
+    op.create_index('ix_sales_person_daily_activity_date', 'sales_person_daily_activity', ['date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sales_person_daily_activity_date', table_name='sales_person_daily_activity')
+    op.drop_table('sales_person_daily_activity')
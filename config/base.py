@@ -1,18 +1,50 @@
+from typing import List
+
 from pydantic import BaseSettings
 
 
 class Settings(BaseSettings):
     DB_URL: str
+    ASYNC_DB_URL: str = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_SYNC_POOL_SIZE: int = 2
+    DB_SYNC_MAX_OVERFLOW: int = 0
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_APPLICATION_NAME: str = "crm"
+    DB_MAX_CONNECTIONS: int = 100
+    DB_REPLICA_URLS: List[str] = []
+    DB_REPLICA_STICKY_SECONDS: int = 5
+    DB_REPLICA_RETRY_SECONDS: int = 30
+    DB_SCHEMA_MODE: str = "check"
     HOST: str
     PORT: int
     JWT_SECRET_KEY: str
     JWT_REFRESH_SECRET_KEY: str
     JWT_TOKEN_EXPIRY_DAYS : int
+    JWT_REFRESH_TOKEN_EXPIRY_DAYS: int = 365
+    JWT_CACHE_SIZE: int = 10000
+    JWT_REVOCATION_REFRESH_SECONDS: float = 5
+    JWT_REVOCATION_REBUILD_SECONDS: int = 3600
+    JWT_REVOCATION_BLOOM_BITS: int = 1 << 20
+    JWT_REVOCATION_BLOOM_HASHES: int = 7
     ALGORITHM: str
     BASE_API_URL: str
     REFERRAL_CODE_HASH_SALT : str
     SENDGRID_API_KEY: str
     SENDGRID_EMAIL: str
+    EMAIL_TRANSPORT: str = "sendgrid"
+    EMAIL_SMTP_HOST: str = "localhost"
+    EMAIL_SMTP_PORT: int = 1025
+    EMAIL_WORKER_ENABLED: bool = True
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_POLL_INTERVAL: float = 2
+    EMAIL_MAX_ATTEMPTS: int = 8
+    EMAIL_RETRY_BASE_SECONDS: int = 30
+    EMAIL_RETRY_MAX_SECONDS: int = 3600
     MSG_91_BASE_URL: str
     MSG_91_OTP_ENDPOINT: str
     MSG_91_RETRY_OTP_ENDPOINT: str
@@ -20,12 +52,36 @@ class Settings(BaseSettings):
     MSG_91_AUTH_KEY: str
     MSG_91_SENDER: str
     HASH_POLICY: str
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_QUEUE_WARN: int = 16
+    PAGINATION_MAX_LIMIT: int = 1000
+    PAGINATION_COUNT_TTL: int = 30
+    REFERENCE_CACHE_TTL: int = 300
+    EXPORT_BATCH_SIZE: int = 1000
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_URL: str = None
+    RATE_LIMIT_REDIS_RETRY_SECONDS: int = 30
+    RATE_LIMIT_LOGIN_IP_LIMIT: int = 30
+    RATE_LIMIT_LOGIN_IP_WINDOW: int = 60
+    RATE_LIMIT_LOGIN_EMAIL_LIMIT: int = 10
+    RATE_LIMIT_LOGIN_EMAIL_WINDOW: int = 300
     # PASSWORD_SALT: str
-    # MONGO_CONN_STR: str
-    # MONGO_DB_NAME: str
+    MONGO_CONN_STR: str = "mongodb://localhost:27017"
+    MONGO_DB_NAME: str = "crm"
+    MONGO_MAX_POOL_SIZE: int = 20
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 10000
+    FILE_CACHE_MAX_AGE: int = 86400
+    UPLOAD_MAX_BYTES: int = 6000000
+    UPLOAD_CHUNK_SIZE: int = 261120
+    UPLOAD_FORM_OVERHEAD_BYTES: int = 65536
 
     API_KEY : str
     PROJECT_HOME: str
+    GUNICORN_WORKERS: int = None
     TWILIO_ACCOUNT_SID: str
     TWILIO_AUTH_TOKEN: str
     TWILIO_SERVICE_ID: str
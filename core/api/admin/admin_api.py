@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Form, UploadFile
-from sqlalchemy.orm import Session
-from typing import Any
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Optional
 
 from core.api.admin import schema
 from core.api.admin import crud
@@ -14,23 +16,25 @@ from core.api.sales_person.crud import (
                                 create_user,
                                 get_user_roles
                                  )
-from core.database.connection import get_db, get_mongo_db
-from core.jwt.auth_bearer import JWTBearer
-from core.jwt import auth_handler
+from core.database.connection import get_async_db, get_read_db, get_mongo_db
+from core.utils import export, file_storage
+from core.utils.responses import success_response
+from core.jwt.principal import Principal, get_current_user
 from core.api.super_admin.crud import display_admin_profile
+from core.utils import password
 
 
 router = APIRouter()
 
 @router.post("/register", status_code=201, tags=["Admin"])
-async def create_user_api(users: schema.UserCreate, token = Depends(JWTBearer()), db: Session = Depends(get_db)):
+async def create_user_api(users: schema.UserCreate, principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Register sales person
     
     """
-    crud.check_admin(db, token)
+    crud.check_admin(principal)
     if users.role_id in [6]:
-        reg_email : Any = check_if_user_exists(db = db, email = users.email)
+        reg_email : Any = await check_if_user_exists(db = db, email = users.email)
         if reg_email :
             raise HTTPException(
                 status_code=409,
@@ -46,7 +50,7 @@ async def create_user_api(users: schema.UserCreate, token = Depends(JWTBearer())
                 }
             )
 
-        reg_phone: Any = get_user_by_phonenumber(db, phone_number=users.phone_number)
+        reg_phone: Any = await get_user_by_phonenumber(db, phone_number=users.phone_number)
         if reg_phone:
             raise HTTPException(
                 status_code=409,
@@ -79,7 +83,9 @@ async def create_user_api(users: schema.UserCreate, token = Depends(JWTBearer())
                     }
                 )
 
-            created_user, role = create_user(db, users)
+            new_password = password.create_new_password()
+            hashed_password = await password.hash_password_async(new_password, password.role_category(users.role_id))
+            created_user, role = await create_user(db, users, new_password, hashed_password)
             response_msg = {
                 "detail": {
                     "status": "Success",
@@ -129,13 +135,13 @@ async def create_user_api(users: schema.UserCreate, token = Depends(JWTBearer())
         )
 
 @router.post("/create_sales_person", tags=["Admin"])
-async def create_sales_person(sales_person: schema.CreateSalesPerson, token = Depends(JWTBearer()), db : Session = Depends(get_db)):
+async def create_sales_person(sales_person: schema.CreateSalesPerson, principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_async_db)):
     """
     Create sales person
     
     """
-    crud.check_admin(db, token)
-    user = crud.get_user_by_id(db = db, user_id = sales_person.users_id)
+    crud.check_admin(principal)
+    user = await crud.get_user_by_id(db = db, user_id = sales_person.users_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -150,7 +156,7 @@ async def create_sales_person(sales_person: schema.CreateSalesPerson, token = De
                 }
             }
         )
-    sales_person_profile = crud.get_sales_person(db = db, users_id = sales_person.users_id)
+    sales_person_profile = await crud.get_sales_person(db = db, users_id = sales_person.users_id)
     if sales_person_profile :
         raise HTTPException(
             status_code=409,
@@ -165,7 +171,7 @@ async def create_sales_person(sales_person: schema.CreateSalesPerson, token = De
                 }
             }
         )
-    sales_person_creation = crud.create_sales_person(db = db, users_id = sales_person.users_id, sales_person = sales_person)
+    sales_person_creation = await crud.create_sales_person(db = db, users_id = sales_person.users_id, sales_person = sales_person)
     if sales_person_creation :
         response_msg = {
             "detail": {
@@ -197,43 +203,29 @@ async def create_sales_person(sales_person: schema.CreateSalesPerson, token = De
         )
 
 @router.get("/display_all_sales_person", tags=["Admin"])
-async def display_all_sales_person(skip : int = 0, limit: int = 10, token = Depends(JWTBearer()), db : Session = Depends(get_db)):
+async def display_all_sales_person(skip : int = 0, limit: int = 10, cursor : Optional[int] = None, include_count : bool = True, principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_read_db)):
 
-    crud.check_admin(db, token)
-    users = crud.get_user_sales_person(db = db)
-    user_id = []
-    for i in users:
-        for j in i:
-            user_id.append(j)
-    sales_person_profile = crud.display_all_sales_person(db = db, users_id = user_id)
-    response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "Sales person profiles",
-                    "profile" : sales_person_profile[skip : skip + limit],
-                    "pagination" :{
-                        "limit" : limit,
-                        "skip" : skip,
-                        "count" : len(list(sales_person_profile)),
-                        "data_count" : len(list(sales_person_profile)[skip : skip + limit])
-                    },
-                    "sort" : {
-                        "sort_by" : "Sort by store id",
-                    }, 
-                },
-                "error": None
-            }
-        }
-    return response_msg
+    crud.check_admin(principal)
+    page = await crud.display_all_sales_person(db = db, skip = skip, limit = limit, cursor = cursor, include_count = include_count)
+    return success_response(
+        "Sales person profiles",
+        profile = page.items,
+        pagination = {
+            "limit" : page.limit,
+            "skip" : page.skip,
+            "count" : page.count,
+            "data_count" : len(page.items),
+            "next_cursor" : page.next_cursor
+        },
+        sort = {
+            "sort_by" : "Sort by store id",
+        },
+    )
 
 @router.put("/update_sales_person", tags=["Admin"])
-async def update_sales_person(sales_person : schema.UpdateSalesPerson, token = Depends(JWTBearer()), db : Session = Depends(get_db)):
+async def update_sales_person(sales_person : schema.UpdateSalesPerson, principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_async_db)):
 
-    crud.check_admin(db, token)
+    crud.check_admin(principal)
     if not sales_person.sales_person_id :
         raise HTTPException(
             status_code=400,
@@ -248,7 +240,7 @@ async def update_sales_person(sales_person : schema.UpdateSalesPerson, token = D
                 }
             }
         )
-    sales_person_profile = crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
+    sales_person_profile = await crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
     if not sales_person_profile :
         raise HTTPException(
             status_code=404,
@@ -265,7 +257,7 @@ async def update_sales_person(sales_person : schema.UpdateSalesPerson, token = D
         )
     profile_data = sales_person.dict(exclude_unset=True)
     del profile_data['sales_person_id']
-    update_profile = crud.update_sales_person(db = db, sales_person_id = sales_person_profile.id, sales_person = profile_data, users_id = sales_person_profile.users_id)
+    update_profile = await crud.update_sales_person(db = db, sales_person_id = sales_person_profile.id, sales_person = profile_data, users_id = sales_person_profile.users_id)
     if update_profile :
         response_msg = {
             "detail": {
@@ -297,9 +289,9 @@ async def update_sales_person(sales_person : schema.UpdateSalesPerson, token = D
         )
 
 @router.post("/change_password", tags=["Admin"])
-async def change_password(sales_person : schema.SalesPersonId, token = Depends(JWTBearer()), db : Session = Depends(get_db)):
+async def change_password(sales_person : schema.SalesPersonId, principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_async_db)):
 
-    crud.check_admin(db, token)
+    crud.check_admin(principal)
     if not sales_person.sales_person_id :
         raise HTTPException(
             status_code=400,
@@ -314,7 +306,7 @@ async def change_password(sales_person : schema.SalesPersonId, token = Depends(J
                 }
             }
         )
-    sales_person_profile = crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
+    sales_person_profile = await crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
     if not sales_person_profile :
         raise HTTPException(
             status_code=404,
@@ -329,8 +321,10 @@ async def change_password(sales_person : schema.SalesPersonId, token = Depends(J
                 }
             }
         )
-    user = crud.get_user_by_id(db = db, user_id = sales_person_profile.users_id)
-    change_password = crud.update_password(db = db, users_id = sales_person_profile.users_id, email = user.email)
+    user = await crud.get_user_by_id(db = db, user_id = sales_person_profile.users_id)
+    new_password = password.create_new_password()
+    hashed_password = await password.hash_password_async(new_password)
+    change_password = await crud.update_password(db = db, users_id = sales_person_profile.users_id, email = user.email, new_password = new_password, hashed_password = hashed_password)
     if change_password :
         response_msg = {
             "detail": {
@@ -361,9 +355,9 @@ async def change_password(sales_person : schema.SalesPersonId, token = Depends(J
         )
     
 @router.post("/display_sales_person", tags = ['Admin'])
-async def display_sales_person(sales_person : schema.SalesPersonId, token = Depends(JWTBearer()), db : Session = Depends(get_db)):
+async def display_sales_person(sales_person : schema.SalesPersonId, principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_read_db)):
 
-    crud.check_admin(db, token)
+    crud.check_admin(principal)
     if not sales_person.sales_person_id :
         raise HTTPException(
             status_code=400,
@@ -378,7 +372,7 @@ async def display_sales_person(sales_person : schema.SalesPersonId, token = Depe
                 }
             }
         )
-    profile = crud.display_sales_person(db = db, sales_person_id = sales_person.sales_person_id)
+    profile = await crud.display_sales_person(db = db, sales_person_id = sales_person.sales_person_id)
     if profile:
         response_msg = {
             "detail": {
@@ -423,12 +417,12 @@ async def display_sales_person(sales_person : schema.SalesPersonId, token = Depe
             }
         )
 
-@router.post("/profile-image-upload", dependencies=[Depends(JWTBearer())], tags=["Admin"])
+@router.post("/profile-image-upload", tags=["Admin"])
 async def profile_image_upload(file_upload : UploadFile, file_collection : str = Form(), source_id : int = Form(), sales_person_id : int = Form()\
-                        , token = Depends(JWTBearer()), db : Session=Depends(get_db), mongo_db = Depends(get_mongo_db)):
+                        , principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_async_db), mongo_db = Depends(get_mongo_db)):
     
-    crud.check_admin(db, token)
-    sales_person_profile = crud.get_sales_person_id(db = db, sales_person_id = sales_person_id)
+    crud.check_admin(principal)
+    sales_person_profile = await crud.get_sales_person_id(db = db, sales_person_id = sales_person_id)
     if not sales_person_profile :
         raise HTTPException(
             status_code=404,
@@ -443,7 +437,7 @@ async def profile_image_upload(file_upload : UploadFile, file_collection : str =
                 }
             }
         )
-    user = crud.get_user_by_id(db = db, user_id = sales_person_profile.users_id)
+    user = await crud.get_user_by_id(db = db, user_id = sales_person_profile.users_id)
     if file_collection not in ('sppi'):
         raise HTTPException (
             status_code = 404,
@@ -475,53 +469,7 @@ async def profile_image_upload(file_upload : UploadFile, file_collection : str =
         )
     
     file_name = file_collection + "_" + str(source_id)
-    file_content = await file_upload.read()
-    file_types = file_upload.content_type
-    file_type_split = str(file_types).split('/')
-    if 'image' != file_type_split[0]:
-        raise HTTPException (
-            status_code = 400,
-            detail = {
-                "status": "Error",
-                "status_code" : 400,
-                "data": None,
-                "error" : {
-                    "status_code" : 400,
-                    "status":"Error",
-                    "message" : "only image can upload",
-                }
-            }
-        )
-    if len(file_content) <= 0:
-        raise HTTPException (
-            status_code = 400,
-            detail = {
-                "status": "Error",
-                "status_code" : 400,
-                "data": None,
-                "error" : {
-                    "status_code" : 400,
-                    "status":"Error",
-                    "message" : "No file",
-                }
-            }
-        )
-    elif len(file_content) >= 6000000:
-        raise HTTPException (
-            status_code = 413,
-            detail = {
-                "status": "Error",
-                "status_code" : 413,
-                "data": None,
-                "error" : {
-                    "status_code" : 413,
-                    "status":"Error",
-                    "message" : "Image size must be less than 6 mb",
-                }
-            }
-        )
-    content_type = file_upload.content_type
-    result = crud.save_file(mongo_db, file_collection, file_name, file_content, content_type)
+    result = await file_storage.save_upload(mongo_db, file_collection, file_name, file_upload)
     if not result:
         raise HTTPException (
             status_code = 500,
@@ -539,7 +487,7 @@ async def profile_image_upload(file_upload : UploadFile, file_collection : str =
     
     if file_collection == 'sppi':
         image_path = {'profile_image' : str(result)}
-        update_profile_image = crud.update_profile(db =db, user_id= user.__dict__['id'],update_data=image_path)
+        update_profile_image = await crud.update_profile(db =db, user_id= user.__dict__['id'],update_data=image_path)
         if update_profile_image > 0:
 
             print("success")
@@ -562,7 +510,7 @@ async def profile_image_upload(file_upload : UploadFile, file_collection : str =
     }
 
 @router.get("/profile-image-download/{file_collection}/{file_id}", tags=["Admin"])
-async def profile_image_download(file_collection : str ,file_id : str, mongo_db = Depends(get_mongo_db)):
+async def profile_image_download(file_collection : str ,file_id : str, request : Request, mongo_db = Depends(get_mongo_db)):
 
     if file_collection not in ('sppi'):
         raise HTTPException (
@@ -579,8 +527,8 @@ async def profile_image_download(file_collection : str ,file_id : str, mongo_db
             },
         )
     
-    exists = crud.check_if_file_exists(mongo_db, file_collection, file_id)
-    if not exists:
+    grid_out = file_storage.open_file(mongo_db, file_collection, file_id)
+    if not grid_out:
         raise HTTPException (
             status_code = 404,
             detail = {
@@ -594,42 +542,13 @@ async def profile_image_download(file_collection : str ,file_id : str, mongo_db
                 }
             },
         )
-        
-    result = crud.retrieve_file(mongo_db, file_collection, file_id)
-    if not result:
-        raise HTTPException (
-            status_code = 500,
-            detail = {
-                "status": "Error",
-                "status_code" : 500,
-                "data": None,
-                "error" : {
-                    "status_code" : 500,
-                    "status":"Error",
-                    "message" : "File download failed",
-                }
-            },
-        )
-      
-    # return {
-    #     "detail": {
-    #         "status": "Success",
-    #         "status_code": 200,
-    #         "data": {
-    #             "status_code": 200,
-    #             "status": "Success",
-    #             "message": "File downloaded Successfully",
-    #             "content": result
-    #         },
-    #         "error": None
-    #     }
-    # }
-    return Response(status_code=200, content=result)
 
-@router.delete("/profile-image-delete/{file_collection}", dependencies=[Depends(JWTBearer())], tags=["Admin"])
-async def profile_image_delete(file_collection : str,sales_person_id : int, token = Depends(JWTBearer()), db : Session=Depends(get_db), mongo_db = Depends(get_mongo_db)):
+    return file_storage.file_response(request, grid_out)
+
+@router.delete("/profile-image-delete/{file_collection}", tags=["Admin"])
+async def profile_image_delete(file_collection : str,sales_person_id : int, principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_async_db), mongo_db = Depends(get_mongo_db)):
 
-    crud.check_admin(db, token)
+    crud.check_admin(principal)
     if not sales_person_id :
         raise HTTPException(
             status_code=400,
@@ -644,7 +563,7 @@ async def profile_image_delete(file_collection : str,sales_person_id : int, toke
                 }
             }
         )
-    sales_person_profile = crud.get_sales_person_id(db = db, sales_person_id = sales_person_id)
+    sales_person_profile = await crud.get_sales_person_id(db = db, sales_person_id = sales_person_id)
     if not sales_person_profile :
         raise HTTPException(
             status_code=404,
@@ -675,7 +594,7 @@ async def profile_image_delete(file_collection : str,sales_person_id : int, toke
             },
         )
 
-    sales_person_profile = crud.get_sales_person_id(db=db, sales_person_id=sales_person_profile.id)
+    sales_person_profile = await crud.get_sales_person_id(db=db, sales_person_id=sales_person_profile.id)
     if file_collection == 'sppi':
         if not sales_person_profile:
             raise HTTPException (
@@ -693,7 +612,7 @@ async def profile_image_delete(file_collection : str,sales_person_id : int, toke
             )
         file_id = sales_person_profile.profile_image
 
-        exists = crud.check_if_file_exists(mongo_db, file_collection, file_id)
+        exists = file_storage.file_exists(mongo_db, file_collection, file_id)
         if not exists:
             raise HTTPException (
                 status_code = 404,
@@ -708,7 +627,7 @@ async def profile_image_delete(file_collection : str,sales_person_id : int, toke
                     }
                 },
             )
-        result = crud.delete_file(mongo_db, file_collection, file_id)
+        result = file_storage.delete_file(mongo_db, file_collection, file_id)
         if not result:
             raise HTTPException (
                 status_code = 500,
@@ -724,7 +643,7 @@ async def profile_image_delete(file_collection : str,sales_person_id : int, toke
                 },
             )
         update_data = {"profile_image" : None}
-        update_profile_info = crud.update_profile(db=db, user_id= sales_person_profile.users_id, update_data= update_data)
+        update_profile_info = await crud.update_profile(db=db, user_id= sales_person_profile.users_id, update_data= update_data)
         if not update_profile_info:
             raise HTTPException (
                 status_code = 400,
@@ -755,10 +674,10 @@ async def profile_image_delete(file_collection : str,sales_person_id : int, toke
     
 
 @router.put("/block-sales-person", tags = ['Admin'])
-async def block_sales_person(sales_person : schema.SalesPersonId,token = Depends(JWTBearer()), db: Session = Depends(get_db)):
+async def block_sales_person(sales_person : schema.SalesPersonId,principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
 
-    crud.check_admin(db, token)
-    user_sales_person = crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
+    crud.check_admin(principal)
+    user_sales_person = await crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
     if not user_sales_person:
         raise HTTPException(
             status_code=404,
@@ -773,7 +692,7 @@ async def block_sales_person(sales_person : schema.SalesPersonId,token = Depends
                 }
             }
         )
-    user = get_user_by_id(db = db, user_id = user_sales_person.users_id)
+    user = await get_user_by_id(db = db, user_id = user_sales_person.users_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -788,7 +707,7 @@ async def block_sales_person(sales_person : schema.SalesPersonId,token = Depends
                 }
             }
         )
-    role = check_role(db = db, users_id = user.id)
+    role = await check_role(db = db, users_id = user.id)
     if not role.role_id == 6 :
         raise HTTPException(
             status_code=400,
@@ -817,7 +736,7 @@ async def block_sales_person(sales_person : schema.SalesPersonId,token = Depends
                 }
             }
         )
-    role = check_role(db = db, users_id = user.id)
+    role = await check_role(db = db, users_id = user.id)
     if role.__dict__['role_id'] in [1] :
         raise HTTPException(
             status_code=400,
@@ -832,7 +751,7 @@ async def block_sales_person(sales_person : schema.SalesPersonId,token = Depends
                 }
             }
         )
-    block_user = crud.update_block_user(db = db, users_id = user.id, block = True)
+    block_user = await crud.update_block_user(db = db, users_id = user.id, block = True)
     if block_user :
         response_msg = {
             "detail": {
@@ -863,10 +782,10 @@ async def block_sales_person(sales_person : schema.SalesPersonId,token = Depends
         )
     
 @router.put("/unblock-sales-person", tags = ['Admin'])
-async def unblock_sales_person(sales_person : schema.SalesPersonId,token = Depends(JWTBearer()), db: Session = Depends(get_db)):
+async def unblock_sales_person(sales_person : schema.SalesPersonId,principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
 
-    crud.check_admin(db, token)
-    user = crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
+    crud.check_admin(principal)
+    user = await crud.get_sales_person_id(db = db, sales_person_id = sales_person.sales_person_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -881,7 +800,7 @@ async def unblock_sales_person(sales_person : schema.SalesPersonId,token = Depen
                 }
             }
         )
-    user = get_user_by_id(db = db, user_id = user.users_id)
+    user = await get_user_by_id(db = db, user_id = user.users_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -896,7 +815,7 @@ async def unblock_sales_person(sales_person : schema.SalesPersonId,token = Depen
                 }
             }
         )
-    role = check_role(db = db, users_id = user.id)
+    role = await check_role(db = db, users_id = user.id)
     if not role.__dict__['role_id'] in [6] :
         raise HTTPException(
             status_code=400,
@@ -925,7 +844,7 @@ async def unblock_sales_person(sales_person : schema.SalesPersonId,token = Depen
                 }
             }
         )
-    role = check_role(db = db, users_id = user.id)
+    role = await check_role(db = db, users_id = user.id)
     if role.__dict__['role_id'] in [1] :
         raise HTTPException(
             status_code=400,
@@ -940,7 +859,7 @@ async def unblock_sales_person(sales_person : schema.SalesPersonId,token = Depen
                 }
             }
         )
-    block_user = crud.update_block_user(db = db, users_id = user.id, block = False)
+    block_user = await crud.update_block_user(db = db, users_id = user.id, block = False)
     if block_user :
         response_msg = {
             "detail": {
@@ -971,53 +890,27 @@ async def unblock_sales_person(sales_person : schema.SalesPersonId,token = Depen
         )
     
 @router.get("/list-blocked-sales-person", tags = ["Admin"])
-async def list_blocked_sales_person(skip : int = 0, limit: int = 10, token = Depends(JWTBearer()), db: Session = Depends(get_db)):
+async def list_blocked_sales_person(skip : int = 0, limit: int = 10, cursor : Optional[int] = None, include_count : bool = True, principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
 
-    crud.check_admin(db, token)
-    user_id = crud.get_users_id_from_roles(db = db)
-    user_profile = []
-    for i in user_id:
-        for j in i:
-            user_profile.append(j)
-    profile = crud.display_blocked_sales_person(db = db, users_id = user_profile)
-    if not profile :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "There is no blocked users"
-                },
-                "error": None
-            }
-        }
-        return response_msg
-    elif profile:
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "List of blocked sales person",
-                    "profile" : profile[skip : skip + limit]
-                },
-                "pagination" :{
-                        "limit" : limit,
-                        "skip" : skip,
-                        "count" : len(list(profile)),
-                        "data_count" : len(list(profile)[skip : skip + limit])
-                    },
-                    "sort" : {
-                        "sort_by" : "Sort by store id",
-                    },
-                "error": None
-            }
-        }
-        return response_msg
+    crud.check_admin(principal)
+    page = await crud.display_blocked_sales_person(db = db, skip = skip, limit = limit, cursor = cursor, include_count = include_count)
+    if not page.items :
+        return success_response("There is no blocked users")
+    elif page.items:
+        return success_response(
+            "List of blocked sales person",
+            profile = page.items,
+            pagination = {
+                "limit" : page.limit,
+                "skip" : page.skip,
+                "count" : page.count,
+                "data_count" : len(page.items),
+                "next_cursor" : page.next_cursor
+            },
+            sort = {
+                "sort_by" : "Sort by store id",
+            },
+        )
     else:
         raise HTTPException(
             status_code=500,
@@ -1034,25 +927,8 @@ async def list_blocked_sales_person(skip : int = 0, limit: int = 10, token = Dep
         )
 
 @router.get("/admin-profile", tags = ["Admin"])
-async def admin_profile(token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    token = auth_handler.decode_token(token=token)
-    user = crud.get_user_by_email(db, token['sub'])
-    if  not user:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status" : "Error",
-                "status_code" : 404,
-                "data" : None,
-                "error" : {
-                    "status_code":404,
-                    "status":'Error', 
-                    "message" : "User not found"
-                }
-            }
-        )
-    verify_user_role = get_user_roles(db = db, users_id = user.id, role = 2)
-    if not verify_user_role:
+async def admin_profile(principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    if 2 not in principal.role_ids:
         raise HTTPException(
             status_code=400,
             detail={
@@ -1066,7 +942,7 @@ async def admin_profile(token = Depends(JWTBearer()), db: Session = Depends(get_
                 }
             }
         )
-    admin = display_admin_profile(db = db, users_id = user.id)
+    admin = await display_admin_profile(db = db, users_id = principal.id)
     if admin :
         response_msg = {
             "detail": {
@@ -1098,56 +974,101 @@ async def admin_profile(token = Depends(JWTBearer()), db: Session = Depends(get_
         )
     
 
-@router.get("/list-time-log",dependencies=[Depends(JWTBearer())], tags=["Admin"])
-async def list_of_time_log(token = Depends(JWTBearer()), db : Session=Depends(get_db)):
-    """ list of all time logs """
-    payload = auth_handler.decode_token(token)
-    userdata = crud.get_user_by_email(db=db, email=payload['sub'])
+@router.get("/time-log-report", tags=["Admin"])
+async def time_log_report(period : str = "day", start_date : Optional[date] = None, end_date : Optional[date] = None,
+                          users_id : Optional[int] = None, skip : int = 0, limit : int = 10, include_count : bool = True,
+                          principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_read_db)):
+    """
+    Logged in time per sales person per day, week or month.
+    Served from the daily rollups, so the cost doesn't grow with the time log.
 
-    if not userdata:
+    """
+    crud.check_admin(principal)
+    if period not in crud.report_periods:
         raise HTTPException(
-            status_code=404,
+            status_code=400,
             detail={
-                "status": "Error",
-                "status_code": 404,
-                "data": None,
-                "error": {
-                    "status_code": 404,
-                    "status": "Error",
-                    "message": "Invalid user"
+                "status" : "Error",
+                "status_code" : 400,
+                "data" : None,
+                "error" : {
+                    "status_code":400,
+                    "status":'Error',
+                    "message" : "period must be one of day, week, month"
                 }
             }
         )
-    active_log = crud.list_time_logs(db=db)
-    if not active_log :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "No data ! There is no time log data"
-                },
-                "error": None
+    page = await crud.time_log_report(db = db, period = period, start_date = start_date, end_date = end_date,
+                                      users_id = users_id, skip = skip, limit = limit, include_count = include_count)
+    return success_response(
+        "Time log report",
+        report = page.items,
+        pagination = {
+            "limit" : page.limit,
+            "skip" : page.skip,
+            "count" : page.count,
+            "data_count" : len(page.items),
+        },
+        sort = {
+            "sort_by" : "Sort by period, newest first",
+        },
+    )
+
+
+def export_format_error():
+    return HTTPException(
+        status_code=400,
+        detail={
+            "status" : "Error",
+            "status_code" : 400,
+            "data" : None,
+            "error" : {
+                "status_code":400,
+                "status":'Error',
+                "message" : "format must be one of csv, ndjson"
             }
         }
-        return response_msg
+    )
+
+
+@router.get("/export-time-log", tags=["Admin"])
+async def export_time_log(format : str = "csv", start_date : Optional[date] = None, end_date : Optional[date] = None,
+                          users_id : Optional[int] = None, principal : Principal = Depends(get_current_user),
+                          db : AsyncSession = Depends(get_read_db)):
+    """
+    Time log sessions as a CSV or NDJSON download.
+    Rows are streamed from the database as they are read.
+
+    """
+    crud.check_admin(principal)
+    if format not in export.export_formats:
+        raise export_format_error()
+    query = crud.time_log_export_query(start_date = start_date, end_date = end_date, users_id = users_id)
+    return export.export_response(db, query, format, "time-log")
+
+
+@router.get("/export-sales-person", tags=["Admin"])
+async def export_sales_person(format : str = "csv", principal : Principal = Depends(get_current_user),
+                              db : AsyncSession = Depends(get_read_db)):
+    """
+    All sales person profiles as a CSV or NDJSON download.
+    Rows are streamed from the database as they are read.
+
+    """
+    crud.check_admin(principal)
+    if format not in export.export_formats:
+        raise export_format_error()
+    return export.export_response(db, crud.sales_person_export_query(), format, "sales-person")
+
+
+@router.get("/list-time-log",tags=["Admin"])
+async def list_of_time_log(principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_read_db)):
+    """ list of all time logs """
+    active_log = await crud.list_time_logs(db=db)
+    if not active_log :
+        return success_response("No data ! There is no time log data")
     elif active_log :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "Active time log",
-                    "time_log" : active_log
-                },
-                "error": None
-            }
-        }
-        return response_msg
+        return success_response("Active time log", time_log = active_log)
     else:
         raise HTTPException(
             status_code=500,
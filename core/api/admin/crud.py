@@ -1,61 +1,42 @@
-import gridfs
+from datetime import date
 
-from bson.objectid import ObjectId
-from sqlalchemy.orm import Session, load_only
-from sqlalchemy import and_ 
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from sqlalchemy import and_, func, select, update
 from fastapi import HTTPException
 
 from core.api.admin import schema
 from core.api.sales_person import models
-from core.jwt import auth_handler
-from core.api.sales_person.models import Users, SalesPersonProfile, UserRoles
-from core.api.sales_person.crud import (
-    get_user_by_email,
-    check_role )
-from core.utils import password
-from core.utils import sendgrid_service
+from core.jwt.principal import Principal
+from core.api.sales_person.models import Users, SalesPersonProfile, UserRoles, SalesPersonDailyActivity
+from core.api.sales_person.crud import get_user_by_email
+from core.utils.email_outbox import enqueue_email
+from core.utils.pagination import Page, count_rows, paginate, page_bounds, invalidate_count
 from config.base import settings
 
 
 
-def update_block_user(db : Session, users_id : int, block : bool):
-    result = db.query(Users).filter(Users.id == users_id).update({"blocked" : block})
-    db.commit()
-    return result
+async def update_block_user(db : AsyncSession, users_id : int, block : bool):
+    result = await db.execute(update(Users).where(Users.id == users_id).values({"blocked" : block}))
+    await db.commit()
+    return result.rowcount
 
-def get_users_id_from_roles(db : Session):
-    return db.query(UserRoles.users_id).filter(UserRoles.role_id == 6).all()
-
-def display_blocked_sales_person(db : Session, users_id : list):
-    profile_data = db.query(SalesPersonProfile.id,
+async def display_blocked_sales_person(db : AsyncSession, skip : int = 0, limit : int = 10,
+                                       cursor : int = None, include_count : bool = True):
+    query = select(SalesPersonProfile.id,
                             Users.id.label("user_id"),
                             Users.full_name,
                             Users.email,
                             Users.phone_number,
                             Users.blocked)\
-                            .join(Users,Users.id == SalesPersonProfile.users_id, isouter=True)\
-                            .filter( and_(Users.blocked == True, Users.id .in_(users_id))).all()
-    return profile_data
-
-def check_admin(db, token):
-    payload = auth_handler.decode_token(token=token)
-    user = get_user_by_email(db, payload['sub'])
-    if not user:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status" : "Error",
-                "status_code" : 404,
-                "data" : None,
-                "error" : {
-                    "status_code":404,
-                    "status":'Error', 
-                    "message" : "User not found."
-                }
-            }
-        )
-    role = check_role(db = db, users_id = user.id)
-    if not role.__dict__['role_id'] in [1,2] :
+                            .join(Users,Users.id == SalesPersonProfile.users_id)\
+                            .join(UserRoles, and_(UserRoles.users_id == Users.id, UserRoles.role_id == 6))\
+                            .filter(Users.blocked == True)
+    return await paginate(db, query, SalesPersonProfile.id, "id", skip = skip, limit = limit, cursor = cursor,
+                          include_count = include_count)
+
+def check_admin(principal : Principal):
+    if not principal.role_ids & {1, 2} :
         raise HTTPException(
             status_code=400,
             detail={
@@ -70,16 +51,18 @@ def check_admin(db, token):
             }
         )
     
-def get_user_by_id(db: Session, user_id: int):
-    return db.query(Users).options(load_only(
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    result = await db.execute(select(Users).options(load_only(
             "id", "full_name", "email", "phone_number", "referral_code", "referred_by", "blocked", 
             "deleted", "created_at", "updated_at"
-        )).filter(Users.id == user_id).first()
+        )).filter(Users.id == user_id))
+    return result.scalars().first()
 
-def get_sales_person(db : Session, users_id : int):
-    return db.query(SalesPersonProfile).filter(SalesPersonProfile.users_id == users_id).first()
+async def get_sales_person(db : AsyncSession, users_id : int):
+    result = await db.execute(select(SalesPersonProfile).filter(SalesPersonProfile.users_id == users_id))
+    return result.scalars().first()
 
-def create_sales_person(db : Session, users_id : int, sales_person : schema.CreateSalesPerson):
+async def create_sales_person(db : AsyncSession, users_id : int, sales_person : schema.CreateSalesPerson):
     add_db = SalesPersonProfile(
         users_id = users_id,
         dob = sales_person.dob,
@@ -94,15 +77,13 @@ def create_sales_person(db : Session, users_id : int, sales_person : schema.Crea
         designation = sales_person.designation
     )
     db.add(add_db)
-    db.commit()
-    db.refresh(add_db)
+    await db.commit()
+    await db.refresh(add_db)
+    invalidate_count("sales_person")
     return add_db
 
-def get_user_sales_person(db : Session):
-    return db.query(UserRoles.users_id).filter(UserRoles.role_id == 6).all()
-
-def display_all_sales_person(db : Session, users_id : list):
-    profile_data = db.query(SalesPersonProfile.users_id,
+def sales_person_query():
+    return select(SalesPersonProfile.users_id,
                             Users.full_name,
                             Users.email,
                             Users.phone_number,
@@ -121,35 +102,41 @@ def display_all_sales_person(db : Session, users_id : list):
                             SalesPersonProfile.updated_at,
                             SalesPersonProfile.designation,
                             Users.blocked)\
-                            .join(Users, Users.id == SalesPersonProfile.users_id, isouter=True)\
-                            .filter(Users.id .in_(users_id)).order_by(SalesPersonProfile.id) .all()
-    return profile_data
+                            .join(Users, Users.id == SalesPersonProfile.users_id)\
+                            .join(UserRoles, and_(UserRoles.users_id == Users.id, UserRoles.role_id == 6))
+
+async def display_all_sales_person(db : AsyncSession, skip : int = 0, limit : int = 10,
+                                   cursor : int = None, include_count : bool = True):
+    return await paginate(db, sales_person_query(), SalesPersonProfile.id, "id", skip = skip, limit = limit, cursor = cursor,
+                          include_count = include_count, count_cache_key = "sales_person")
 
-def get_sales_person_id(db : Session, sales_person_id : int):
-    return db.query(SalesPersonProfile).filter(SalesPersonProfile.id == sales_person_id).first()
+def sales_person_export_query():
+    return sales_person_query().order_by(SalesPersonProfile.id)
 
-def update_sales_person(db : Session, sales_person_id : int, sales_person : dict, users_id : int ):
+async def get_sales_person_id(db : AsyncSession, sales_person_id : int):
+    result = await db.execute(select(SalesPersonProfile).filter(SalesPersonProfile.id == sales_person_id))
+    return result.scalars().first()
+
+async def update_sales_person(db : AsyncSession, sales_person_id : int, sales_person : dict, users_id : int ):
     if "full_name" in sales_person:
-        result = db.query(Users).filter(Users.id == users_id).update({"full_name":sales_person['full_name']})
-        db.commit()
+        result = await db.execute(update(Users).where(Users.id == users_id).values({"full_name":sales_person['full_name']}))
+        await db.commit()
         del sales_person['full_name']
     if sales_person :
-        result = db.query(SalesPersonProfile).filter(SalesPersonProfile.id == sales_person_id).update(sales_person)
-        db.commit()
-        return result
+        result = await db.execute(update(SalesPersonProfile).where(SalesPersonProfile.id == sales_person_id).values(sales_person))
+        await db.commit()
+        return result.rowcount
     else :
         return True
     
-def update_password(db : Session, users_id : int, email : str):
-    create_password = password.create_new_password()
-    sendgrid_service.send_email(email, title = 'Change Password', subject = 'Change Password', action = None, message1 = 'Change Password', message2 = create_password, action_url = None, support_url = settings.SENDGRID_EMAIL)
-    hashed_password = password.get_hashed_password(password=create_password)
-    password_update = db.query(Users).filter(Users.id == users_id).update({"password":hashed_password})
-    db.commit()
-    return password_update
-
-def display_sales_person(db: Session, sales_person_id : int):
-    profile_data = db.query(SalesPersonProfile.users_id,
+async def update_password(db : AsyncSession, users_id : int, email : str, new_password : str, hashed_password : str):
+    enqueue_email(db, email, title = 'Change Password', subject = 'Change Password', action = None, message1 = 'Change Password', message2 = new_password, action_url = None, support_url = settings.SENDGRID_EMAIL)
+    password_update = await db.execute(update(Users).where(Users.id == users_id).values({"password":hashed_password}))
+    await db.commit()
+    return password_update.rowcount
+
+async def display_sales_person(db: AsyncSession, sales_person_id : int):
+    profile_data = await db.execute(select(SalesPersonProfile.users_id,
                             Users.full_name,
                             Users.email,
                             Users.phone_number,
@@ -169,52 +156,72 @@ def display_sales_person(db: Session, sales_person_id : int):
                             SalesPersonProfile.designation,
                             Users.blocked)\
                             .join(Users, Users.id == SalesPersonProfile.users_id, isouter=True)\
-                            .filter(SalesPersonProfile.id == sales_person_id).first()
-    return profile_data
-
-def update_profile(db : Session, user_id : int, update_data : dict):
-    result = db.query(SalesPersonProfile).filter(SalesPersonProfile.users_id==user_id).update(update_data)
-    db.commit()
-    return result
-
-def save_file(mongo_db , collection : str, file_name: str, content : bytes, content_type : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        stored = fs.put(content, filename=file_name, contentType=content_type)
-        return stored
-    except Exception as e:
-        print(e)
-        return False
-    
-def check_if_file_exists(mongo_db, collection : str, file_id : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        exists = fs.exists(ObjectId(file_id))
-        if not exists:
-            return False
-        return True
-    except Exception as e:
-        print(e)
-
-def retrieve_file(mongo_db, collection : str, file_id : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        result = fs.get(ObjectId(file_id)).read()
-        return result
-    except Exception as e:
-        print(e)
-        return False
-
-def delete_file(mongo_db, collection : str, file_id : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        fs.delete(ObjectId(file_id))
-        return True
-    except Exception as e:
-        print(e)
-        return False
-    
-
-def list_time_logs(db:Session):
-    get_data = db.query(models.SalesPersonTimeTracking).all()
-    return get_data
\ No newline at end of file
+                            .filter(SalesPersonProfile.id == sales_person_id))
+    return profile_data.first()
+
+async def update_profile(db : AsyncSession, user_id : int, update_data : dict):
+    result = await db.execute(update(SalesPersonProfile).where(SalesPersonProfile.users_id==user_id).values(update_data))
+    await db.commit()
+    return result.rowcount
+
+async def list_time_logs(db:AsyncSession):
+    get_data = await db.execute(select(models.SalesPersonTimeTracking))
+    return get_data.scalars().all()
+
+def time_log_export_query(start_date : date = None, end_date : date = None, users_id : int = None):
+    tracking = models.SalesPersonTimeTracking
+    query = select(tracking.id,
+                   tracking.users_id,
+                   Users.full_name,
+                   Users.email,
+                   tracking.date,
+                   tracking.log_in_time,
+                   tracking.log_out_time,
+                   tracking.duration_seconds,
+                   tracking.active)\
+                   .join(Users, Users.id == tracking.users_id)
+    if start_date:
+        query = query.filter(tracking.date >= start_date)
+    if end_date:
+        query = query.filter(tracking.date <= end_date)
+    if users_id:
+        query = query.filter(tracking.users_id == users_id)
+    # primary key order streams without sorting first, sessions are inserted as they start
+    return query.order_by(tracking.id)
+
+report_periods = {
+    "day" : SalesPersonDailyActivity.date,
+    "week" : SalesPersonDailyActivity.week,
+    "month" : SalesPersonDailyActivity.month,
+}
+
+async def time_log_report(db : AsyncSession, period : str = "day", start_date : date = None, end_date : date = None,
+                          users_id : int = None, skip : int = 0, limit : int = 10, include_count : bool = True) -> Page:
+    """
+    Logged in seconds and sessions per sales person and day, week or month,
+    summed from the daily rollups. The date range applies to days, so a week
+    or month cut by it only counts the days inside. Newest periods first.
+    """
+    period_column = report_periods[period]
+    totals = select(SalesPersonDailyActivity.users_id,
+                    period_column.label("period_start"),
+                    func.sum(SalesPersonDailyActivity.active_seconds).label("active_seconds"),
+                    func.sum(SalesPersonDailyActivity.sessions).label("sessions"))
+    if start_date:
+        totals = totals.filter(SalesPersonDailyActivity.date >= start_date)
+    if end_date:
+        totals = totals.filter(SalesPersonDailyActivity.date <= end_date)
+    if users_id:
+        totals = totals.filter(SalesPersonDailyActivity.users_id == users_id)
+    totals = totals.group_by(SalesPersonDailyActivity.users_id, period_column).subquery()
+    query = select(totals.c.users_id,
+                   Users.full_name,
+                   Users.email,
+                   totals.c.period_start,
+                   totals.c.active_seconds,
+                   totals.c.sessions)\
+                   .join(Users, Users.id == totals.c.users_id)
+    skip, limit = page_bounds(skip, limit)
+    count = await count_rows(db, query) if include_count else None
+    items = (await db.execute(query.order_by(totals.c.period_start.desc(), totals.c.users_id).offset(skip).limit(limit))).all()
+    return Page(items = items, count = count, next_cursor = None, skip = skip, limit = limit)
@@ -1,37 +1,38 @@
-import phonenumbers
-
 from fastapi.security import OAuth2PasswordBearer
 
 import datetime
-from hashids import Hashids
-from sqlalchemy import and_
-from sqlalchemy.orm import Session, load_only
-from passlib.context import CryptContext
+from functools import lru_cache
+from sqlalchemy import DateTime, Integer, Time, and_, case, cast, extract, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
-from core.utils import sendgrid_service
+from core.utils.activity_rollup import add_session, dialect_inserts
+from core.utils.email_outbox import enqueue_email
 from config.base import settings
 from core.api.sales_person import models
 from core.api.admin.models import AdminProfile
 from core.api.admin import schema
-from core.database.connection import get_db
-from core.utils import password, time
+from core.jwt import auth_handler
+from core.models.models import RefreshToken
+from core.utils import time
+from core.utils.pagination import Page, paginate
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user_email_login")
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 secret = settings.JWT_SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 
 
+@lru_cache()
+def get_hashids():
+    from hashids import Hashids
+    return Hashids(salt=settings.REFERRAL_CODE_HASH_SALT, min_length=6)
+
 def generate_referralcode(hash_input):
-    hash_salt = settings.REFERRAL_CODE_HASH_SALT
-    hashids = Hashids(salt=hash_salt, min_length=6)
-    hash_output = hashids.encode(hash_input)
+    hash_output = get_hashids().encode(hash_input)
     return hash_output
 
-def create_user(db: Session, user: schema.UserCreate):
-    create_password = password.create_new_password()
-    sendgrid_service.send_email(user.email, title = 'New Password', subject = 'New Password', action = None, message1 = 'New Password', message2 = create_password, action_url = None, support_url = settings.SENDGRID_EMAIL)
-    hashed_password = password.get_hashed_password(password=create_password)
+async def create_user(db: AsyncSession, user: schema.UserCreate, new_password : str, hashed_password : str):
+    enqueue_email(db, user.email, title = 'New Password', subject = 'New Password', action = None, message1 = 'New Password', message2 = new_password, action_url = None, support_url = settings.SENDGRID_EMAIL)
     db_user = models.Users(
         full_name=user.full_name,
         email=user.email,
@@ -42,38 +43,44 @@ def create_user(db: Session, user: schema.UserCreate):
         referral_code=generate_referralcode(int(user.phone_number[-10:])),
     )
     db.add(db_user)
-    db.flush()
+    await db.flush()
     
     role = models.UserRoles(
         users_id=db_user.id,
         role_id=user.role_id
     )
     db.add(role)
-    db.commit()
+    await db.commit()
     return db_user, role
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.Users).options(load_only(
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.Users).options(load_only(
             "id", "full_name", "email", "phone_number", "referral_code", "referred_by", "blocked", 
             "deleted", "created_at", "updated_at"
-        )).filter(models.Users.email == email).first()
+        )).filter(models.Users.email == email))
+    return result.scalars().first()
 
-def get_user_by_phonenumber(db: Session, phone_number: str):
-    return db.query(models.Users).options(load_only(
+async def get_user_by_phonenumber(db: AsyncSession, phone_number: str):
+    result = await db.execute(select(models.Users).options(load_only(
             "id", "full_name", "email", "phone_number", "referral_code", "referred_by", "blocked", 
             "deleted", "created_at", "updated_at"
-        )).filter(models.Users.phone_number == phone_number).first()
+        )).filter(models.Users.phone_number == phone_number))
+    return result.scalars().first()
 
 
-def get_user_by_id(db: Session, user_id: int):
-    return db.query(models.Users).options(load_only(
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    result = await db.execute(select(models.Users).options(load_only(
             "id", "full_name", "email", "phone_number", "referral_code", "referred_by", "blocked", 
             "deleted", "created_at", "updated_at"
-        )).filter(models.Users.id == user_id).first()
+        )).filter(models.Users.id == user_id))
+    return result.scalars().first()
 
 
 def validate_phone_number(phone_number: str, country_code: str) -> bool:
+    # phonenumbers loads large metadata tables, only pay for them on registration
+    import phonenumbers
+
     try:
         if country_code:
             phone_number_obj = phonenumbers.parse(phone_number, country_code)
@@ -85,81 +92,166 @@ def validate_phone_number(phone_number: str, country_code: str) -> bool:
         return False
     return True
 
-def verify_password(password: str, hashed_pass: str) -> bool:
-    return password_context.verify(password, hashed_pass)
-
-def verify_email_password(db:Session , email:str ,password:str):
-    userinfo = db.query(models.Users).filter(models.Users.email==email).first()
-    verify_pass=verify_password(password,userinfo.password)
-
-    if  verify_pass:
-        return userinfo
-        
-    else:
-        return None
-
-def get_user_roles(db : Session, users_id : int, role : int):
-    return db.query(models.UserRoles).filter(and_(models.UserRoles.users_id==users_id , models.UserRoles.role_id==role)).first()
-
-def check_if_user_exists(db : Session, email : str):
-    return get_user_by_email(db, email)
+async def get_user_for_login(db : AsyncSession, email : str):
+    result = await db.execute(select(models.Users).options(load_only(
+            "id", "full_name", "email", "phone_number", "password", "blocked", "deleted"
+        )).filter(models.Users.email == email))
+    return result.scalars().first()
 
-def check_role(db : Session, users_id : int):
-    return db.query(models.UserRoles).filter(models.UserRoles.users_id == users_id).first()
+async def get_user_roles(db : AsyncSession, users_id : int, role : int):
+    result = await db.execute(select(models.UserRoles).filter(and_(models.UserRoles.users_id==users_id , models.UserRoles.role_id==role)))
+    return result.scalars().first()
 
-def update_last_login(db : Session, users_id : int):
-    update_admin = db.query(AdminProfile).update({"last_login" : datetime.datetime.now()})
-    db.commit()
-    return update_admin
+async def check_if_user_exists(db : AsyncSession, email : str):
+    return await get_user_by_email(db, email)
 
-def display_all_merchant_stages(db:Session):
-    merchant_stages = db.query(models.MerchantStages).all()
-    return merchant_stages
+async def check_role(db : AsyncSession, users_id : int):
+    result = await db.execute(select(models.UserRoles).filter(models.UserRoles.users_id == users_id))
+    return result.scalars().first()
 
-
-def start_time_tracking(db:Session,user_id:int):
+async def get_user_with_roles(db : AsyncSession, email : str):
+    """ One row per role of the user, a single row with role_id None when it has none """
+    result = await db.execute(select(models.Users.id,
+                    models.Users.email,
+                    models.Users.blocked,
+                    models.UserRoles.role_id
+                    ).join(models.UserRoles, models.UserRoles.users_id == models.Users.id, isouter=True)\
+                    .filter(models.Users.email == email))
+    return result.all()
+
+async def update_last_login(db : AsyncSession, users_id : int):
+    update_admin = await db.execute(update(AdminProfile).values({"last_login" : datetime.datetime.now()}))
+    await db.commit()
+    return update_admin.rowcount
+
+async def update_password_hash(db : AsyncSession, users_id : int, hashed_password : str):
+    """ Replaces the stored hash of the same password, the caller commits """
+    result = await db.execute(update(models.Users).where(models.Users.id == users_id)
+        .values(password = hashed_password, updated_at = datetime.datetime.utcnow()))
+    return result.rowcount
+
+def add_refresh_token(db : AsyncSession, users_id : int, family_id : str, expires_at : datetime.datetime):
+    """ Adds the next refresh token of the family and returns it, the caller commits """
+    token = auth_handler.new_refresh_token()
+    now = datetime.datetime.utcnow()
+    db.add(RefreshToken(users_id = users_id, family_id = family_id, token_hash = auth_handler.hash_refresh_token(token),
+                        expires_at = expires_at, created_at = now, updated_at = now))
+    return token
+
+async def get_refresh_token(db : AsyncSession, token_hash : str):
+    result = await db.execute(
+        select(RefreshToken.id, RefreshToken.users_id, RefreshToken.family_id, RefreshToken.expires_at,
+               RefreshToken.used_at, RefreshToken.revoked_at, models.Users.email, models.Users.blocked, models.Users.deleted)
+        .join(models.Users, models.Users.id == RefreshToken.users_id)
+        .filter(RefreshToken.token_hash == token_hash))
+    return result.first()
+
+async def use_refresh_token(db : AsyncSession, id : int, now : datetime.datetime):
+    """ Marks the token as used, returns 0 if it was used or revoked before """
+    result = await db.execute(update(RefreshToken)
+        .where(RefreshToken.id == id, RefreshToken.used_at.is_(None), RefreshToken.revoked_at.is_(None))
+        .values(used_at = now, updated_at = now))
+    return result.rowcount
+
+async def revoke_refresh_family(db : AsyncSession, family_id : str, now : datetime.datetime):
+    result = await db.execute(update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at = now, updated_at = now))
+    return result.rowcount
+
+async def display_all_merchant_stages(db:AsyncSession):
+    merchant_stages = await db.execute(select(models.MerchantStages))
+    return merchant_stages.scalars().all()
+
+
+async def start_time_tracking(db:AsyncSession,user_id:int):
+    """
+    Opens a session for the user in one statement. Returns False when the
+    user already has an open one, the partial unique index on open sessions
+    turns the insert into a no-op then.
+    """
     current_data = datetime.datetime.now()
-    tracking_data = models.SalesPersonTimeTracking(
+    tracking = models.SalesPersonTimeTracking
+    insert = dialect_inserts[db.bind.dialect.name]
+    statement = insert(tracking).values(
         users_id = user_id,
-        date = datetime.datetime.today(),
+        date = current_data.date(),
         log_in_time = current_data.time(),
-        active = "true"
-    )
-
-    db.add(tracking_data)
-    db.commit()
-    return tracking_data
-
-def end_time_tracking(db:Session,user_id:int):
-
-
-    get_data = db.query(models.SalesPersonTimeTracking).filter(models.SalesPersonTimeTracking.users_id==user_id,models.SalesPersonTimeTracking.active == "true").first()
-    if get_data:
-        current_data = datetime.datetime.now().time()
-        time1 = datetime.datetime.strptime(str(get_data.log_in_time), "%H:%M:%S.%f")
-        time2 = datetime.datetime.strptime(str(current_data), "%H:%M:%S.%f")
-        delta = time2 - time1
-        active_time = str(datetime.timedelta(seconds=delta.total_seconds()))
-
-        get_data = db.query(models.SalesPersonTimeTracking).filter(models.SalesPersonTimeTracking.users_id == user_id,
-                    models.SalesPersonTimeTracking.active == "true").update({'log_out_time':current_data,"active":"false","active_login_time":active_time})
-
-        db.commit()
-        return get_data
+        active = True
+    ).on_conflict_do_nothing(index_elements = [tracking.users_id], index_where = tracking.active)
+    if db.bind.dialect.implicit_returning:
+        result = await db.execute(statement.returning(tracking.id, tracking.users_id, tracking.log_in_time))
+        tracking_data = result.first()
     else:
+        # no RETURNING, a skipped insert shows as no row changed
+        result = await db.execute(statement)
+        tracking_data = None
+        if result.rowcount:
+            tracking_data = (await db.execute(select(tracking.id, tracking.users_id, tracking.log_in_time)
+                                              .where(tracking.id == result.inserted_primary_key[0]))).first()
+    await db.commit()
+    return tracking_data or False
+
+async def end_time_tracking(db:AsyncSession,user_id:int):
+    """
+    Ends the open session of the user with one UPDATE ... RETURNING. The
+    duration is computed by the database in seconds and added to the daily
+    rollups in the same transaction.
+    """
+    now = datetime.datetime.now()
+    tracking = models.SalesPersonTimeTracking
+    if not db.bind.dialect.implicit_returning:
+        return await end_time_tracking_without_returning(db, user_id, now)
+    elapsed = cast(now, DateTime) - (tracking.date + tracking.log_in_time)
+    duration = func.greatest(cast(func.floor(extract("epoch", elapsed)), Integer), 0)
+    result = await db.execute(update(tracking)
+        .where(tracking.users_id == user_id, tracking.active == True)
+        .values(log_out_time = now.time(), active = False, duration_seconds = duration,
+                # active_login_time is a time of day, it can't hold a day or more
+                active_login_time = case((elapsed < datetime.timedelta(days=1), cast(elapsed, Time)), else_ = None))
+        .returning(tracking.date, tracking.log_in_time, tracking.duration_seconds)
+        .execution_options(synchronize_session = False))
+    ended = result.first()
+    if not ended:
+        return False
+    await add_session(db, user_id, datetime.datetime.combine(ended.date, ended.log_in_time), ended.duration_seconds)
+    await db.commit()
+    return 1
+
+async def end_time_tracking_without_returning(db : AsyncSession, user_id : int, now : datetime.datetime):
+    """ end_time_tracking for dialects without RETURNING, e.g. SQLite: reads the open session, then closes it """
+    tracking = models.SalesPersonTimeTracking
+    opened = (await db.execute(select(tracking.id, tracking.date, tracking.log_in_time)
+                               .where(tracking.users_id == user_id, tracking.active == True))).first()
+    if not opened:
+        return False
+    start = datetime.datetime.combine(opened.date, opened.log_in_time)
+    elapsed = max(now - start, datetime.timedelta(0))
+    duration = int(elapsed.total_seconds())
+    result = await db.execute(update(tracking)
+        .where(tracking.id == opened.id, tracking.active == True)
+        .values(log_out_time = now.time(), active = False, duration_seconds = duration,
+                active_login_time = (datetime.datetime.min + elapsed).time() if elapsed < datetime.timedelta(days=1) else None)
+        .execution_options(synchronize_session = False))
+    if not result.rowcount:
+        # ended by a concurrent request
         return False
+    await add_session(db, user_id, start, duration)
+    await db.commit()
+    return 1
     
 
-def list_time_logs_for_salesperson(db:Session,user_id:int):
-    get_data = db.query(models.SalesPersonTimeTracking).filter(models.SalesPersonTimeTracking.users_id==user_id).all()
-    return get_data
+async def list_time_logs_for_salesperson(db:AsyncSession,user_id:int):
+    get_data = await db.execute(select(models.SalesPersonTimeTracking).filter(models.SalesPersonTimeTracking.users_id==user_id))
+    return get_data.scalars().all()
 
-def get_sales_person_team_members(db : Session, users_id : int):
-    return db.query(models.Users.id,
+async def get_sales_person_team_members(db : AsyncSession, users_id : int, skip : int = 0, limit : int = 10) -> Page:
+    query = select(models.Users.id,
                     models.Users.email,
                     models.Users.full_name,
                     models.Users.phone_number,
                     models.SalesPersonProfile.designation,
                     models.SalesPersonProfile.profile_image
                     ).join(models.SalesPersonProfile, models.Users.id == models.SalesPersonProfile.users_id,
-                    ).filter(models.Users.id != users_id).all()
\ No newline at end of file
+                    ).filter(models.Users.id != users_id)
+    return await paginate(db, query, key = models.Users.id, key_name = "id", skip = skip, limit = limit)
\ No newline at end of file
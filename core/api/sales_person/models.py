@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, UniqueConstraint, Date, Enum, Time
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Text, UniqueConstraint, Date, Enum, Time
 from sqlalchemy.orm import relationship
 
 from core.database.connection import Base
@@ -41,6 +41,7 @@ class UserRoles(Base, TimeStamp):
     users = relationship("Users", back_populates="user_role", uselist=False)
     __table_args__ = (
         UniqueConstraint("users_id", "role_id", name="unique_user_role"),
+        Index("ix_user_roles_role_id_users_id", "role_id", "users_id"),
     )
 
 
@@ -75,4 +76,22 @@ class SalesPersonTimeTracking(Base):
     log_in_time = Column(Time)
     log_out_time = Column(Time,nullable=True)
     active_login_time = Column(Time,nullable=True)
-    active = Column(String(10))
\ No newline at end of file
+    duration_seconds = Column(Integer, nullable=True)
+    active = Column(Boolean, nullable=False, default=False)
+    __table_args__ = (
+        Index("ix_sales_person_time_tracking_users_id_date", "users_id", "date"),
+        # at most one open session per user
+        Index("ux_sales_person_time_tracking_open", "users_id", unique=True, postgresql_where=active, sqlite_where=active),
+    )
+
+class SalesPersonDailyActivity(Base):
+    __tablename__ = "sales_person_daily_activity"
+    users_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    week = Column(Date, nullable=False)
+    month = Column(Date, nullable=False)
+    active_seconds = Column(Integer, nullable=False, default=0)
+    sessions = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        Index("ix_sales_person_daily_activity_date", "date"),
+    )
@@ -1,14 +1,20 @@
 #import requests
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.api.sales_person import crud
-from core.database.connection import get_db
-from core.jwt import auth_handler
-from core.jwt.auth_bearer import JWTBearer
+from config.base import settings
+from core.api.sales_person import crud, schema
+from core.database.connection import get_async_db, get_read_db
+from core.jwt import auth_handler, revocation
+from core.jwt.principal import Principal, get_current_user
+from core.utils import password, rate_limit, reference_cache
+from core.utils.responses import success_response
 from core.api.admin.crud import get_sales_person, display_sales_person
 
 router = APIRouter()
@@ -16,13 +22,14 @@ router = APIRouter()
 
 
 
-@router.post("/user_email_login", tags=["Sales Person"])
-def user_email_login(role : int, db:Session=Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+@router.post("/user_email_login", tags=["Sales Person"],
+             dependencies=[Depends(rate_limit.login_ip_limit), Depends(rate_limit.login_email_limit)])
+async def user_email_login(role : int, db:AsyncSession=Depends(get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Login for sales person, admin and super admin
 
     """
-    check_user = crud.get_user_by_email(db=db, email=form_data.username)
+    check_user = await crud.get_user_for_login(db=db, email=form_data.username)
     if not check_user or check_user.__dict__['deleted']==True:    
         raise HTTPException(
             status_code=404,
@@ -52,7 +59,7 @@ def user_email_login(role : int, db:Session=Depends(get_db), form_data: OAuth2Pa
             }
         )
     else:
-        verify_user_role = crud.get_user_roles(db=db, users_id=check_user.__dict__['id'], role=role)
+        verify_user_role = await crud.get_user_roles(db=db, users_id=check_user.__dict__['id'], role=role)
         if not verify_user_role:
             raise HTTPException(
             status_code=404,
@@ -68,7 +75,8 @@ def user_email_login(role : int, db:Session=Depends(get_db), form_data: OAuth2Pa
             }
         )
         else:    
-            verify_password = crud.verify_email_password(db=db, email=form_data.username, password=form_data.password)
+            verify_password, new_hash = await password.verify_and_update_password_async(
+                form_data.password, check_user.password, password.role_category(verify_user_role.role_id))
 
             if not verify_password:
                 raise HTTPException(
@@ -85,12 +93,18 @@ def user_email_login(role : int, db:Session=Depends(get_db), form_data: OAuth2Pa
                     }
                 )
             else:
-                userinfo = crud.verify_email_password(db=db, email=form_data.username, password=form_data.password)
+                userinfo = check_user
                 if userinfo:
                     if verify_user_role.role_id == 2:
-                        last_login = crud.update_last_login(db = db, users_id = check_user.__dict__['id'])
-                    token = auth_handler.encode_token(form_data.username)
-                    refresh_token = auth_handler.refresh_token(form_data.username)
+                        last_login = await crud.update_last_login(db = db, users_id = check_user.__dict__['id'])
+                    if new_hash:
+                        # hashed with an older cost setting, replace it while the password is at hand
+                        await crud.update_password_hash(db = db, users_id = check_user.id, hashed_password = new_hash)
+                    family_id = uuid4().hex
+                    refresh_token = crud.add_refresh_token(db = db, users_id = check_user.id, family_id = family_id,
+                                                           expires_at = datetime.utcnow() + timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRY_DAYS))
+                    await db.commit()
+                    token = auth_handler.encode_token(form_data.username, family_id = family_id)
                     response_msg = {
                         "detail": {
                             "status": "Success",
@@ -112,67 +126,102 @@ def user_email_login(role : int, db:Session=Depends(get_db), form_data: OAuth2Pa
                     return response_msg
 
 
-@router.post('/user/logout', tags=["Sales Person"])
-async def logout(token = Depends(JWTBearer()), db : Session = Depends(get_db)):
+@router.post('/token/refresh', tags=["Sales Person"])
+async def refresh_access_token(body : schema.RefreshToken, db : AsyncSession = Depends(get_async_db)):
     """
-    Logout for sales person, admin and super admin
+    Exchanges a refresh token for a new access token and a new refresh token.
+    Every refresh token can be used once. Using one a second time means it
+    was copied, so all refresh tokens of that login are revoked.
 
     """
-    token = auth_handler.decode_token(token=token)
-    user = crud.get_user_by_email(db, token['sub'])
-    if user :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status" : "success",
-                    "message" : "Logout"
-                },
-                "error": None
-            }
-        }
-        return response_msg
-    else :
+    now = datetime.utcnow()
+    stored = await crud.get_refresh_token(db = db, token_hash = auth_handler.hash_refresh_token(body.refresh_token))
+    if not stored or stored.revoked_at or stored.expires_at <= now or stored.blocked or stored.deleted:
         raise HTTPException(
-            status_code=400,
+            status_code=401,
             detail={
                 "status" : "Error",
-                "status_code" : 400,
+                "status_code" : 401,
                 "data" : None,
                 "error" : {
-                    "status_code":400,
-                    "status":'Error', 
-                    "message" : "Invalid User"
+                    "status_code":401,
+                    "status":'Error',
+                    "message" : "Invalid refresh token"
                 }
             }
         )
-    
-@router.get("/sales-person-profile", tags = ["Sales Person"])
-async def sales_person_profile(token = Depends(JWTBearer()), db : Session = Depends(get_db)):
-    """
-    Profile view for sales person
-
-    """
-    token = auth_handler.decode_token(token=token)
-    user = crud.get_user_by_email(db, token['sub'])
-    if  not user:
+    if not await crud.use_refresh_token(db = db, id = stored.id, now = now):
+        await crud.revoke_refresh_family(db = db, family_id = stored.family_id, now = now)
+        await db.commit()
         raise HTTPException(
-            status_code=404,
+            status_code=401,
             detail={
                 "status" : "Error",
-                "status_code" : 404,
+                "status_code" : 401,
                 "data" : None,
                 "error" : {
-                    "status_code":404,
-                    "status":'Error', 
-                    "message" : "User not found"
+                    "status_code":401,
+                    "status":'Error',
+                    "message" : "Refresh token already used, please login again"
                 }
             }
         )
-    verify_user_role = crud.get_user_roles(db=db, users_id=user.id, role=6)
-    if not verify_user_role:
+    refresh_token = crud.add_refresh_token(db = db, users_id = stored.users_id, family_id = stored.family_id, expires_at = stored.expires_at)
+    await db.commit()
+    token = auth_handler.encode_token(stored.email, family_id = stored.family_id)
+    response_msg = {
+        "detail": {
+            "status": "Success",
+            "status_code": 200,
+            "data": {
+                "status_code": 200,
+                "status": "Success",
+                "message": "Token refreshed",
+                "access_token": token,
+                "refresh_token": refresh_token,
+                "token_type": "bearer"
+            },
+            "error": None
+        }
+    }
+    return response_msg
+
+
+@router.post('/user/logout', tags=["Sales Person"])
+async def logout(request : Request, principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_async_db)):
+    """
+    Logout for sales person, admin and super admin
+    The access token is revoked, it is refused from now on even before it expires,
+    and so are the refresh tokens issued with it.
+
+    """
+    payload = request.state.token_payload
+    if payload.get('jti'):
+        revocation.revoke(db, payload['jti'], datetime.utcfromtimestamp(payload['exp']))
+    if payload.get('fid'):
+        await crud.revoke_refresh_family(db = db, family_id = payload['fid'], now = datetime.utcnow())
+    await db.commit()
+    response_msg = {
+        "detail": {
+            "status": "Success",
+            "status_code": 200,
+            "data": {
+                "status_code": 200,
+                "status" : "success",
+                "message" : "Logout"
+            },
+            "error": None
+        }
+    }
+    return response_msg
+    
+@router.get("/sales-person-profile", tags = ["Sales Person"])
+async def sales_person_profile(principal : Principal = Depends(get_current_user), db : AsyncSession = Depends(get_read_db)):
+    """
+    Profile view for sales person
+
+    """
+    if 6 not in principal.role_ids:
         raise HTTPException(
         status_code=400,
         detail={
@@ -186,7 +235,7 @@ async def sales_person_profile(token = Depends(JWTBearer()), db : Session = Depe
             }
         }
     )
-    sales_person = get_sales_person(db = db, users_id = user.id)
+    sales_person = await get_sales_person(db = db, users_id = principal.id)
     if not sales_person:
         raise HTTPException(
             status_code=404,
@@ -201,7 +250,7 @@ async def sales_person_profile(token = Depends(JWTBearer()), db : Session = Depe
                 }
             }
         )
-    profile = display_sales_person(db = db, sales_person_id = sales_person.id)
+    profile = await display_sales_person(db = db, sales_person_id = sales_person.id)
     if profile:
         response_msg = {
             "detail": {
@@ -233,14 +282,9 @@ async def sales_person_profile(token = Depends(JWTBearer()), db : Session = Depe
         )
     
 
-@router.get("/display-merchant-stages", tags = ["Sales Person"])
-async def display_all_merchant_stages(db: Session = Depends(get_db)):
-
-    """ Disaplay all merchant stages """
-
-    mer_stages = crud.display_all_merchant_stages(db = db)
+def merchant_stages_response(mer_stages):
     if not mer_stages :
-        response_msg = {
+        return {
             "detail": {
                 "status": "Success",
                 "status_code": 200,
@@ -252,61 +296,35 @@ async def display_all_merchant_stages(db: Session = Depends(get_db)):
                 "error": None
             }
         }
-        return response_msg
-    elif mer_stages :
-        response_msg = {
-            "detail": {
-                "status": "Success",
+    return {
+        "detail": {
+            "status": "Success",
+            "status_code": 200,
+            "data": {
                 "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "Merchant stages",
-                    "merchant_stages" : mer_stages
-                },
-                "error": None
-            }
+                "status": "Success",
+                "message": "Merchant stages",
+                "merchant_stages" : mer_stages
+            },
+            "error": None
         }
-        return response_msg
-    else:
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "status" : "Error",
-                "status_code" : 500,
-                "data" : None,
-                "error" : {
-                    "status_code":500,
-                    "status":'Error',
-                    "message" : "internal server error."
-                }
-            }
-        )
+    }
 
 
-@router.post('/start-time-logged', dependencies=[Depends(JWTBearer())], tags=["Sales Person"])
-async def start_time_logged(start:str, token = Depends(JWTBearer()), db : Session=Depends(get_db)):
-    """ Sales persons active login time tracking """
+@router.get("/display-merchant-stages", tags = ["Sales Person"])
+async def display_all_merchant_stages():
 
-    payload = auth_handler.decode_token(token)
-    userdata = crud.get_user_by_email(db=db, email=payload['sub'])
+    """ Disaplay all merchant stages """
+
+    return await reference_cache.reference_response("merchant_stages", merchant_stages_response)
+
+
+@router.post('/start-time-logged', tags=["Sales Person"])
+async def start_time_logged(start:str, principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_async_db)):
+    """ Sales persons active login time tracking """
 
-    if not userdata:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status": "Error",
-                "status_code": 404,
-                "data": None,
-                "error": {
-                    "status_code": 404,
-                    "status": "Error",
-                    "message": "No user found",
-                }
-            },
-        )
     if start == "true":
-        time_track = crud.start_time_tracking(db=db,user_id=userdata.__dict__['id'])
+        time_track = await crud.start_time_tracking(db=db,user_id=principal.id)
         if time_track == False:
             raise HTTPException(
                 status_code=409,
@@ -356,29 +374,12 @@ async def start_time_logged(start:str, token = Depends(JWTBearer()), db : Sessio
 
 
 
-@router.post('/end-time-logged', dependencies=[Depends(JWTBearer())], tags=["Sales Person"])
-async def end_time_logged(end:str, token = Depends(JWTBearer()), db : Session=Depends(get_db)):
+@router.post('/end-time-logged', tags=["Sales Person"])
+async def end_time_logged(end:str, principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_async_db)):
     """Sales person active-logout time """
 
-    payload = auth_handler.decode_token(token)
-    userdata = crud.get_user_by_email(db=db, email=payload['sub'])
-
-    if not userdata :
-        raise HTTPException (
-            status_code = 404,
-            detail = {
-                "status": "Error",
-                "status_code": 404,
-                "data": None,
-                "error": {
-                    "status_code": 404,
-                    "status": "Error",
-                    "message": "Invalid user"
-                }
-            }
-        )
     if end == "true":
-            end_trcaking = crud.end_time_tracking(db=db,user_id=userdata.__dict__['id'])
+            end_trcaking = await crud.end_time_tracking(db=db,user_id=principal.id)
             if not end_trcaking:
                 raise HTTPException(
                     status_code=409,
@@ -424,56 +425,14 @@ async def end_time_logged(end:str, token = Depends(JWTBearer()), db : Session=De
                 )
             
 
-@router.get("/active-login",dependencies=[Depends(JWTBearer())], tags=["Sales Person"])
-async def list_of_all_time_log(token = Depends(JWTBearer()), db : Session=Depends(get_db)):
+@router.get("/active-login",tags=["Sales Person"])
+async def list_of_all_time_log(principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_read_db)):
     """ list of all time logs for a sales person"""
-    payload = auth_handler.decode_token(token)
-    userdata = crud.get_user_by_email(db=db, email=payload['sub'])
-
-    if not userdata:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status": "Error",
-                "status_code": 404,
-                "data": None,
-                "error": {
-                    "status_code": 404,
-                    "status": "Error",
-                    "message": "Invalid user"
-                }
-            }
-        )
-    active_log = crud.list_time_logs_for_salesperson(db=db,user_id=userdata.__dict__['id'])
+    active_log = await crud.list_time_logs_for_salesperson(db=db,user_id=principal.id)
     if not active_log :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "No data ! There is no time log data"
-                },
-                "error": None
-            }
-        }
-        return response_msg
+        return success_response("No data ! There is no time log data")
     elif active_log :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "Active time log",
-                    "time_log" : active_log
-                },
-                "error": None
-            }
-        }
-        return response_msg
+        return success_response("Active time log", time_log = active_log)
     else:
         raise HTTPException(
             status_code=500,
@@ -490,24 +449,8 @@ async def list_of_all_time_log(token = Depends(JWTBearer()), db : Session=Depend
         )
     
 @router.get("/get-team-members", tags = ["Sales Person"])
-async def get_team_members(skip : int = 0, limit: int = 10, token = Depends(JWTBearer()), db : Session=Depends(get_db)):
-    token = auth_handler.decode_token(token=token)
-    user = crud.get_user_by_email(db, token['sub'])
-    if  not user:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status" : "Error",
-                "status_code" : 404,
-                "data" : None,
-                "error" : {
-                    "status_code":404,
-                    "status":'Error', 
-                    "message" : "User not found"
-                }
-            }
-        )
-    sales_person = get_sales_person(db = db, users_id = user.id)
+async def get_team_members(skip : int = 0, limit: int = 10, principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_read_db)):
+    sales_person = await get_sales_person(db = db, users_id = principal.id)
     if not sales_person:
         raise HTTPException(
             status_code=404,
@@ -522,31 +465,22 @@ async def get_team_members(skip : int = 0, limit: int = 10, token = Depends(JWTB
                 }
             }
         )
-    team_members = crud.get_sales_person_team_members(db = db, users_id = user.id)
-    if team_members:
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status" : "success",
-                    "message" : "Team members",
-                    "team_members" : team_members,
-                    "pagination" :{
-                        "limit" : limit,
-                        "skip" : skip,
-                        "count" : len(list(team_members)),
-                        "data_count" : len(list(team_members)[skip : skip + limit])
-                    },
-                    "sort" : {
-                        "sort_by" :  "Not sorted"
-                    },
-                },
-                "error": None
-            }
-        }
-        return response_msg
+    page = await crud.get_sales_person_team_members(db = db, users_id = principal.id, skip = skip, limit = limit)
+    if page.count:
+        return success_response(
+            "Team members",
+            status = "success",
+            team_members = page.items,
+            pagination = {
+                "limit" : page.limit,
+                "skip" : page.skip,
+                "count" : page.count,
+                "data_count" : len(page.items)
+            },
+            sort = {
+                "sort_by" :  "id"
+            },
+        )
     else :
         raise HTTPException(
             status_code=500,
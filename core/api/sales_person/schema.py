@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+
+class RefreshToken(BaseModel):
+    refresh_token: str = Field(..., min_length=1, max_length=200, description="Refresh token")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "refresh_token": "2Qy3mRk0d6...",
+            },
+        }
@@ -1,23 +1,17 @@
-from sqlalchemy.orm import Session, load_only
-from passlib.context import CryptContext
-from sqlalchemy import and_ 
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from sqlalchemy import and_, select, update
 from fastapi import HTTPException
-import gridfs
-
-from bson.objectid import ObjectId
-from core.jwt import auth_handler
+from core.jwt.principal import Principal
 from core.api.sales_person.models import Users, UserRoles
-from core.api.sales_person.crud import (
-    generate_referralcode,
-    get_user_by_email,
-    check_role )
+from core.api.sales_person.crud import generate_referralcode
 from core.api.admin import models
 from core.api.super_admin import schema
-from core.utils import password, time
+from core.utils import time
+from core.utils.pagination import paginate, invalidate_count
 
 
-def create_user(db: Session, user: schema.AdminCreate):
-    hashed_password = password.get_hashed_password(password = user.password)
+async def create_user(db: AsyncSession, user: schema.AdminCreate, hashed_password : str):
     db_user = Users(
         full_name=user.full_name,
         email=user.email,
@@ -28,7 +22,7 @@ def create_user(db: Session, user: schema.AdminCreate):
         referral_code=generate_referralcode(int(user.phone_number[-10:])),
     )
     db.add(db_user)
-    db.flush()
+    await db.flush()
     
     role = UserRoles(
         users_id=db_user.id,
@@ -43,13 +37,15 @@ def create_user(db: Session, user: schema.AdminCreate):
         last_login = time.utc_time()
     )
     db.add(db_admin)
-    db.commit()
+    await db.commit()
+    invalidate_count("admin")
     return db_user, role, db_admin
 
-def check_admin_exist(db : Session, users_id : int):
-    return db.query(models.AdminProfile).filter(models.AdminProfile.users_id == users_id).first()
+async def check_admin_exist(db : AsyncSession, users_id : int):
+    result = await db.execute(select(models.AdminProfile).filter(models.AdminProfile.users_id == users_id))
+    return result.scalars().first()
 
-def create_admin_profile(db : Session, users : schema.AdminCreate):
+async def create_admin_profile(db : AsyncSession, users : schema.AdminCreate):
     db_create = models.AdminProfile(
         users_id = users.users_id,
         dob = users.dob,
@@ -58,40 +54,41 @@ def create_admin_profile(db : Session, users : schema.AdminCreate):
         profile_image = users.profile_image
     )
     db.add(db_create)
-    db.commit()
-    db.refresh(db_create)
+    await db.commit()
+    await db.refresh(db_create)
     return db_create
 
-def update_admin_profile(db : Session, users_id : int, profile : dict):
+async def update_admin_profile(db : AsyncSession, users_id : int, profile : dict):
     if "full_name" in profile:
-        result = db.query(Users).filter(Users.id == users_id).update({"full_name":profile["full_name"]})
-        db.commit()
+        result = await db.execute(update(Users).where(Users.id == users_id).values({"full_name":profile["full_name"]}))
+        await db.commit()
         del profile["full_name"]
-    result = db.query(models.AdminProfile).filter(models.AdminProfile.users_id == users_id).update(profile)
-    db.commit()
-    return result
-
-def update_block_user(db : Session, users_id : int, block : bool):
-    result = db.query(Users).filter(Users.id == users_id).update({"blocked" : block})
-    db.commit()
-    return result
-
-def get_users_id_from_roles(db : Session):
-    return db.query(UserRoles.users_id).filter(UserRoles.role_id == 2).all()
-
-def display_blocked_admin(db : Session, users_id : list):
-    profile_data = db.query(models.AdminProfile.id.label("admin_id"),
+    result = await db.execute(update(models.AdminProfile).where(models.AdminProfile.users_id == users_id).values(profile))
+    await db.commit()
+    return result.rowcount
+
+async def update_block_user(db : AsyncSession, users_id : int, block : bool):
+    result = await db.execute(update(Users).where(Users.id == users_id).values({"blocked" : block}))
+    await db.commit()
+    return result.rowcount
+
+async def display_blocked_admin(db : AsyncSession, skip : int = 0, limit : int = 10,
+                                cursor : int = None, include_count : bool = True):
+    query = select(models.AdminProfile.id.label("admin_id"),
                              Users.id.label("user_id"), 
                              Users.full_name, 
                              Users.email, 
                              Users.phone_number,
                              Users.blocked)\
-                            .join(Users,Users.id == models.AdminProfile.users_id, isouter=True)\
-                            .filter( and_(Users.blocked == True, Users.id .in_(users_id))).all()
-    return profile_data
-
-def display_all_admin_profile(db : Session):
-    profile_data = db.query(models.AdminProfile.id.label("admin_id"),
+                            .join(Users,Users.id == models.AdminProfile.users_id)\
+                            .join(UserRoles, and_(UserRoles.users_id == Users.id, UserRoles.role_id == 2))\
+                            .filter(Users.blocked == True)
+    return await paginate(db, query, Users.id, "user_id", skip = skip, limit = limit, cursor = cursor,
+                          include_count = include_count)
+
+async def display_all_admin_profile(db : AsyncSession, skip : int = 0, limit : int = 10,
+                                    cursor : int = None, include_count : bool = True):
+    query = select(models.AdminProfile.id.label("admin_id"),
                             Users.id.label("user_id"),
                             Users.full_name,
                             Users.email,
@@ -101,28 +98,12 @@ def display_all_admin_profile(db : Session):
                             models.AdminProfile.last_login,
                             models.AdminProfile.profile_image,
                             Users.blocked)\
-                            .join(Users,Users.id == models.AdminProfile.users_id, isouter=True).order_by(Users.id) .all()
-    return profile_data
+                            .join(Users,Users.id == models.AdminProfile.users_id, isouter=True)
+    return await paginate(db, query, Users.id, "user_id", skip = skip, limit = limit, cursor = cursor,
+                          include_count = include_count, count_cache_key = "admin")
 
-def check_super_admin(db,token):
-    payload = auth_handler.decode_token(token=token)
-    users = get_user_by_email(db, payload['sub'])
-    if not users:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status" : "Error",
-                "status_code" : 404,
-                "data" : None,
-                "error" : {
-                    "status_code":404,
-                    "status":'Error', 
-                    "message" : "Super admin not found."
-                }
-            }
-        )
-    role = check_role(db = db, users_id = users.id)
-    if not role.__dict__['role_id'] in [1] :
+def check_super_admin(principal : Principal):
+    if 1 not in principal.role_ids :
         raise HTTPException(
             status_code=400,
             detail={
@@ -137,8 +118,8 @@ def check_super_admin(db,token):
             }
         )
     
-def display_admin_profile(db : Session, users_id : int):
-    profile_data = db.query(models.AdminProfile.id.label("admin_id"),
+async def display_admin_profile(db : AsyncSession, users_id : int):
+    profile_data = await db.execute(select(models.AdminProfile.id.label("admin_id"),
                             Users.id.label("user_id"),
                             Users.full_name,
                             Users.email,
@@ -148,66 +129,29 @@ def display_admin_profile(db : Session, users_id : int):
                             models.AdminProfile.last_login,
                             models.AdminProfile.profile_image,
                             Users.blocked)\
-                            .join(Users,Users.id == models.AdminProfile.users_id).filter(Users.id == users_id) .order_by(Users.id) .first()
-    return profile_data
+                            .join(Users,Users.id == models.AdminProfile.users_id).filter(Users.id == users_id) .order_by(Users.id))
+    return profile_data.first()
 
-def check_admin_by_admin_id(db : Session, admin_id : int):
-    return db.query(models.AdminProfile).filter(models.AdminProfile.id == admin_id).first()
+async def check_admin_by_admin_id(db : AsyncSession, admin_id : int):
+    result = await db.execute(select(models.AdminProfile).filter(models.AdminProfile.id == admin_id))
+    return result.scalars().first()
 
-def update_profile(db : Session, user_id : int, update_data : dict):
-    result = db.query(models.AdminProfile).filter(models.AdminProfile.users_id==user_id).update(update_data)
-    db.commit()
-    return result
+async def update_profile(db : AsyncSession, user_id : int, update_data : dict):
+    result = await db.execute(update(models.AdminProfile).where(models.AdminProfile.users_id==user_id).values(update_data))
+    await db.commit()
+    return result.rowcount
 
-def update_admin_profile(db : Session, user_id : int, update_data : dict):
+async def update_admin_profile(db : AsyncSession, user_id : int, update_data : dict):
     if "full_name" in update_data:
-        result = db.query(Users).filter(Users.id == user_id).update({"full_name":update_data["full_name"]})
-        db.commit()
+        result = await db.execute(update(Users).where(Users.id == user_id).values({"full_name":update_data["full_name"]}))
+        await db.commit()
         del update_data["full_name"]
-    result = db.query(models.AdminProfile).filter(models.AdminProfile.users_id==user_id).update(update_data)
-    db.commit()
+    result = await db.execute(update(models.AdminProfile).where(models.AdminProfile.users_id==user_id).values(update_data))
+    await db.commit()
     #db.refresh(result) 
-    return result
+    return result.rowcount
 
-def save_file(mongo_db , collection : str, file_name: str, content : bytes, content_type : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        stored = fs.put(content, filename=file_name, contentType=content_type)
-        return stored
-    except Exception as e:
-        print(e)
-        return False
-    
-def check_if_file_exists(mongo_db, collection : str, file_id : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        exists = fs.exists(ObjectId(file_id))
-        if not exists:
-            return False
-        return True
-    except Exception as e:
-        print(e)
-
-def retrieve_file(mongo_db, collection : str, file_id : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        result = fs.get(ObjectId(file_id)).read()
-        return result
-    except Exception as e:
-        print(e)
-        return False
-
-def delete_file(mongo_db, collection : str, file_id : str):
-    try:
-        fs = gridfs.GridFS(mongo_db, collection)
-        fs.delete(ObjectId(file_id))
-        return True
-    except Exception as e:
-        print(e)
-        return False
-    
-def create_superadmin(db : Session, user : schema.SuperAdmin) :
-    hashed_password = password.get_hashed_password(password = user.password)
+async def create_superadmin(db : AsyncSession, user : schema.SuperAdmin, hashed_password : str) :
     db_create = Users(
         full_name = user.full_name,
         email = user.email,
@@ -216,14 +160,15 @@ def create_superadmin(db : Session, user : schema.SuperAdmin) :
         referral_code = user.referral_code
     )
     db.add(db_create)
-    db.flush()
+    await db.flush()
     role = UserRoles(
         users_id=db_create.id,
         role_id=user.role_id
     )
     db.add(role)
-    db.commit()
+    await db.commit()
     return True
 
-def check_admin_exist(db : Session, admin_id):
-    return db.query(models.AdminProfile).filter(models.AdminProfile.id == admin_id).first()
\ No newline at end of file
+async def check_admin_exist(db : AsyncSession, admin_id):
+    result = await db.execute(select(models.AdminProfile).filter(models.AdminProfile.id == admin_id))
+    return result.scalars().first()
\ No newline at end of file
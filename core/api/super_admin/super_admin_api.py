@@ -1,6 +1,6 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, Response,  Form, UploadFile
-from sqlalchemy.orm import Session
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.api.super_admin import schema
 from core.api.super_admin import crud
@@ -9,25 +9,31 @@ from core.api.sales_person.crud import ( get_user_by_email,
                                  validate_phone_number,
                                  check_role,
                                  get_user_by_id)
-from core.database.connection import get_db, get_mongo_db
-from core.utils import password
+from core.database.connection import get_async_db, get_read_db, get_mongo_db
+from core.utils import file_storage
+from core.utils import password, rate_limit
 from core.utils.password import validate_password
+from core.utils.responses import success_response
 from core.jwt import auth_handler
-from core.jwt.auth_bearer import JWTBearer
+from core.jwt.principal import Principal, get_current_user
 from core.api.admin.schema import UserCreate
 
 router = APIRouter()
 
-@router.post("/create-super-admin", tags = ["Super Admin"], include_in_schema=False)
-async def create_super_admin(user: schema.SuperAdmin, db: Session = Depends(get_db)):
-    super_admin = crud.create_superadmin(db = db, user = user)
+# unauthenticated and hashes a password, keep it from being used to burn CPU
+create_super_admin_limit = rate_limit.RateLimit("create-super-admin", 5, 3600)
+
+@router.post("/create-super-admin", tags = ["Super Admin"], include_in_schema=False, dependencies=[Depends(create_super_admin_limit)])
+async def create_super_admin(user: schema.SuperAdmin, db: AsyncSession = Depends(get_async_db)):
+    hashed_password = await password.hash_password_async(user.password, password.role_category(user.role_id))
+    super_admin = await crud.create_superadmin(db = db, user = user, hashed_password = hashed_password)
     return {"Successfully create superadmin"}
 
 @router.post("/create-admin", tags=["Super Admin",])
-async def register_admin(user: schema.AdminCreate, token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    crud.check_super_admin(db, token)
+async def register_admin(user: schema.AdminCreate, principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    crud.check_super_admin(principal)
     if user.role_id ==2:  
-        db_user: Any = get_user_by_email(db, email=user.email)
+        db_user: Any = await get_user_by_email(db, email=user.email)
         if db_user:
             raise HTTPException(
                 status_code=409,
@@ -43,7 +49,7 @@ async def register_admin(user: schema.AdminCreate, token = Depends(JWTBearer()),
                 }
             )
 
-        reg_phone: Any = get_user_by_phonenumber(db, phone_number=user.phone_number)
+        reg_phone: Any = await get_user_by_phonenumber(db, phone_number=user.phone_number)
 
         if reg_phone:
             raise HTTPException(
@@ -94,7 +100,8 @@ async def register_admin(user: schema.AdminCreate, token = Depends(JWTBearer()),
                     }
                 )
                 
-            created_user, role, create_admin = crud.create_user(db, user)
+            hashed_password = await password.hash_password_async(user.password, password.role_category(user.role_id))
+            created_user, role, create_admin = await crud.create_user(db, user, hashed_password)
             response_msg = {
                 "detail": {
                     "status": "Success",
@@ -144,47 +151,26 @@ async def register_admin(user: schema.AdminCreate, token = Depends(JWTBearer()),
         )
 
 @router.get("/display-all-admin", tags = ["Super Admin"])
-async def display_admin(skip : int = 0, limit: int = 10, token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    crud.check_super_admin(db, token)
-    profile = crud.display_all_admin_profile(db = db)
-    if not profile :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "There is no admin profile"
-                },
-                "error": None
-            }
-        }
-        return response_msg
-    elif profile :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "Admin Details",
-                    "profiles" : profile[skip : skip + limit],
-                    "pagination" :{
-                        "limit" : limit,
-                        "skip" : skip,
-                        "count" : len(list(profile)),
-                        "data_count" : len(list(profile)[skip : skip + limit])
-                    },
-                    "sort" : {
-                        "sort_by" : "Sort by store id",
-                    },
-                },
-                "error": None
-            }
-        }
-        return response_msg
+async def display_admin(skip : int = 0, limit: int = 10, cursor : Optional[int] = None, include_count : bool = True, principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    crud.check_super_admin(principal)
+    page = await crud.display_all_admin_profile(db = db, skip = skip, limit = limit, cursor = cursor, include_count = include_count)
+    if not page.items :
+        return success_response("There is no admin profile")
+    elif page.items :
+        return success_response(
+            "Admin Details",
+            profiles = page.items,
+            pagination = {
+                "limit" : page.limit,
+                "skip" : page.skip,
+                "count" : page.count,
+                "data_count" : len(page.items),
+                "next_cursor" : page.next_cursor
+            },
+            sort = {
+                "sort_by" : "Sort by store id",
+            },
+        )
     else:
         raise HTTPException(
             status_code=500,
@@ -201,9 +187,9 @@ async def display_admin(skip : int = 0, limit: int = 10, token = Depends(JWTBear
         )
 
 @router.put("/update-admin", tags=["Super Admin",])
-async def update_admin(users : schema.UpdateAdminProfile, token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    crud.check_super_admin(db,token)
-    user = get_user_by_id(db = db, user_id = users.users_id)
+async def update_admin(users : schema.UpdateAdminProfile, principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    crud.check_super_admin(principal)
+    user = await get_user_by_id(db = db, user_id = users.users_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -218,10 +204,10 @@ async def update_admin(users : schema.UpdateAdminProfile, token = Depends(JWTBea
                 }
             }
         )
-    role = check_role(db = db, users_id = user.id)
+    role = await check_role(db = db, users_id = user.id)
     if role.__dict__['role_id'] in [2] :
         update_data = users.dict(exclude_unset = True)
-        profile_update = crud.update_admin_profile(db, user.id, update_data)
+        profile_update = await crud.update_admin_profile(db, user.id, update_data)
         if profile_update :
             response_msg = {
                 "detail": {
@@ -267,9 +253,9 @@ async def update_admin(users : schema.UpdateAdminProfile, token = Depends(JWTBea
 
 
 @router.put("/block-admin", tags=["Super Admin",])
-async def block_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    crud.check_super_admin(db, token)
-    admin_profile = crud.check_admin_exist(db, admin.admin_id)
+async def block_admin(admin : schema.AdminID,principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    crud.check_super_admin(principal)
+    admin_profile = await crud.check_admin_exist(db, admin.admin_id)
     if not admin_profile :
         raise HTTPException(
             status_code=404,
@@ -284,7 +270,7 @@ async def block_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db: S
                 }
             }
         )
-    user = get_user_by_id(db = db, user_id = admin_profile.users_id)
+    user = await get_user_by_id(db = db, user_id = admin_profile.users_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -313,11 +299,11 @@ async def block_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db: S
                 }
             }
         )
-    role = check_role(db = db, users_id = user.id)
+    role = await check_role(db = db, users_id = user.id)
 
     if role.__dict__['role_id'] in [2] :
 
-        block_user = crud.update_block_user(db = db, users_id = user.id, block = True)
+        block_user = await crud.update_block_user(db = db, users_id = user.id, block = True)
         if block_user :
             response_msg = {
                 "detail": {
@@ -362,9 +348,9 @@ async def block_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db: S
             )
     
 @router.put("/unblock-admin", tags=["Super Admin",])
-async def unblock_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    crud.check_super_admin(db, token)
-    admin_profile = crud.check_admin_exist(db, admin.admin_id)
+async def unblock_admin(admin : schema.AdminID,principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    crud.check_super_admin(principal)
+    admin_profile = await crud.check_admin_exist(db, admin.admin_id)
     if not admin_profile :
         raise HTTPException(
             status_code=404,
@@ -379,7 +365,7 @@ async def unblock_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db:
                 }
             }
         )
-    user = get_user_by_id(db = db, user_id = admin_profile.users_id)
+    user = await get_user_by_id(db = db, user_id = admin_profile.users_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -408,11 +394,11 @@ async def unblock_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db:
                 }
             }
         )
-    role = check_role(db = db, users_id = user.id)
+    role = await check_role(db = db, users_id = user.id)
 
     if role.__dict__['role_id'] in [2] :
         
-        block_user = crud.update_block_user(db = db, users_id = user.id, block = False)
+        block_user = await crud.update_block_user(db = db, users_id = user.id, block = False)
         if block_user :
             response_msg = {
                 "detail": {
@@ -458,52 +444,26 @@ async def unblock_admin(admin : schema.AdminID,token = Depends(JWTBearer()), db:
     
 
 @router.get("/list-blocked-admin", tags = ["Super Admin"])
-async def list_blocked_admin(skip : int = 0, limit: int = 10, token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    crud.check_super_admin(db, token)
-    user_id = crud.get_users_id_from_roles(db = db)
-    user_profile = []
-    for i in user_id:
-        for j in i:
-            user_profile.append(j)
-    profile = crud.display_blocked_admin(db = db, users_id = user_profile)
-    if not profile :
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "There is no blocked users"
-                },
-                "error": None
-            }
-        }
-        return response_msg
-    elif profile:
-        response_msg = {
-            "detail": {
-                "status": "Success",
-                "status_code": 200,
-                "data": {
-                    "status_code": 200,
-                    "status": "Success",
-                    "message": "List of blocked admin",
-                    "profile" : profile[skip : skip + limit],
-                    "pagination" :{
-                        "limit" : limit,
-                        "skip" : skip,
-                        "count" : len(list(profile)),
-                        "data_count" : len(list(profile)[skip : skip + limit])
-                    },
-                    "sort" : {
-                        "sort_by" : "Sort by store id",
-                    },
-                },
-                "error": None
-            }
-        }
-        return response_msg
+async def list_blocked_admin(skip : int = 0, limit: int = 10, cursor : Optional[int] = None, include_count : bool = True, principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    crud.check_super_admin(principal)
+    page = await crud.display_blocked_admin(db = db, skip = skip, limit = limit, cursor = cursor, include_count = include_count)
+    if not page.items :
+        return success_response("There is no blocked users")
+    elif page.items:
+        return success_response(
+            "List of blocked admin",
+            profile = page.items,
+            pagination = {
+                "limit" : page.limit,
+                "skip" : page.skip,
+                "count" : page.count,
+                "data_count" : len(page.items),
+                "next_cursor" : page.next_cursor
+            },
+            sort = {
+                "sort_by" : "Sort by store id",
+            },
+        )
     else:
         raise HTTPException(
             status_code=500,
@@ -520,9 +480,9 @@ async def list_blocked_admin(skip : int = 0, limit: int = 10, token = Depends(JW
         )
     
 @router.post("/display-admin", tags = ["Super Admin"])
-async def display_admin(user : schema.AdminId, token = Depends(JWTBearer()), db: Session = Depends(get_db)):
-    crud.check_super_admin(db, token)
-    admin = crud.check_admin_exist(db = db, admin_id = user.admin_id)
+async def display_admin(user : schema.AdminId, principal : Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    crud.check_super_admin(principal)
+    admin = await crud.check_admin_exist(db = db, admin_id = user.admin_id)
     if not admin :
         raise HTTPException(
             status_code=404,
@@ -537,7 +497,7 @@ async def display_admin(user : schema.AdminId, token = Depends(JWTBearer()), db:
                 }
             }
         )
-    profile = crud.display_admin_profile(db = db, users_id = admin.users_id)
+    profile = await crud.display_admin_profile(db = db, users_id = admin.users_id)
     if profile:
         response_msg = {
             "detail": {
@@ -572,10 +532,10 @@ async def display_admin(user : schema.AdminId, token = Depends(JWTBearer()), db:
     
 @router.post("/admin-profile-image-upload", tags = ["Super Admin"])
 async def admin_profile_image(file_upload : UploadFile,file_collection : str = Form(),source_id : int = Form(),admin_id : int = Form()\
-                             , token = Depends(JWTBearer()),  db : Session=Depends(get_db), mongo_db = Depends(get_mongo_db)):
+                             , principal : Principal = Depends(get_current_user),  db : AsyncSession=Depends(get_async_db), mongo_db = Depends(get_mongo_db)):
 
-    crud.check_super_admin(db, token)
-    admin_profile = crud.check_admin_by_admin_id(db = db, admin_id = admin_id)
+    crud.check_super_admin(principal)
+    admin_profile = await crud.check_admin_by_admin_id(db = db, admin_id = admin_id)
     if not admin_profile :
         raise HTTPException(
             status_code=404,
@@ -607,53 +567,7 @@ async def admin_profile_image(file_upload : UploadFile,file_collection : str = F
         )
     
     file_name = file_collection + "_" + str(source_id)
-    file_content = await file_upload.read()
-    file_types = file_upload.content_type
-    file_type_split = str(file_types).split('/')
-    if 'image' != file_type_split[0]:
-        raise HTTPException (
-            status_code = 400,
-            detail = {
-                "status": "Error",
-                "status_code" : 400,
-                "data": None,
-                "error" : {
-                    "status_code" : 400,
-                    "status":"Error",
-                    "message" : "only image can upload",
-                }
-            }
-        )
-    if len(file_content) <= 0:
-        raise HTTPException (
-            status_code = 400,
-            detail = {
-                "status": "Error",
-                "status_code" : 400,
-                "data": None,
-                "error" : {
-                    "status_code" : 400,
-                    "status":"Error",
-                    "message" : "No file",
-                }
-            }
-        )
-    elif len(file_content) >= 6000000:
-        raise HTTPException (
-            status_code = 413,
-            detail = {
-                "status": "Error",
-                "status_code" : 413,
-                "data": None,
-                "error" : {
-                    "status_code" : 413,
-                    "status":"Error",
-                    "message" : "Image size must be less than 6 mb",
-                }
-            }
-        )
-    content_type = file_upload.content_type
-    result = crud.save_file(mongo_db, file_collection, file_name, file_content, content_type)
+    result = await file_storage.save_upload(mongo_db, file_collection, file_name, file_upload)
     if not result:
         raise HTTPException (
             status_code = 500,
@@ -671,7 +585,7 @@ async def admin_profile_image(file_upload : UploadFile,file_collection : str = F
     
     if file_collection == 'api':
         image_path = {'profile_image' : str(result)}
-        update_profile_image = crud.update_profile(db =db, user_id= admin_profile.__dict__['users_id'],update_data=image_path)
+        update_profile_image = await crud.update_profile(db =db, user_id= admin_profile.__dict__['users_id'],update_data=image_path)
         if update_profile_image > 0:
 
             print("success")
@@ -694,7 +608,7 @@ async def admin_profile_image(file_upload : UploadFile,file_collection : str = F
     }
 
 @router.get("/admin-profile-image-download/{file_collection}/{file_id}", tags=["Super Admin"])
-async def admin_profile_image_download(file_collection : str ,file_id : str, mongo_db = Depends(get_mongo_db)):
+async def admin_profile_image_download(file_collection : str ,file_id : str, request : Request, mongo_db = Depends(get_mongo_db)):
 
     if file_collection not in ('api'):
         raise HTTPException (
@@ -711,8 +625,8 @@ async def admin_profile_image_download(file_collection : str ,file_id : str, mon
             },
         )
     
-    exists = crud.check_if_file_exists(mongo_db, file_collection, file_id)
-    if not exists:
+    grid_out = file_storage.open_file(mongo_db, file_collection, file_id)
+    if not grid_out:
         raise HTTPException (
             status_code = 404,
             detail = {
@@ -726,43 +640,14 @@ async def admin_profile_image_download(file_collection : str ,file_id : str, mon
                 }
             },
         )
-        
-    result = crud.retrieve_file(mongo_db, file_collection, file_id)
-    if not result:
-        raise HTTPException (
-            status_code = 500,
-            detail = {
-                "status": "Error",
-                "status_code" : 500,
-                "data": None,
-                "error" : {
-                    "status_code" : 500,
-                    "status":"Error",
-                    "message" : "File download failed",
-                }
-            },
-        )
-      
-    # return {
-    #     "detail": {
-    #         "status": "Success",
-    #         "status_code": 200,
-    #         "data": {
-    #             "status_code": 200,
-    #             "status": "Success",
-    #             "message": "File downloaded Successfully",
-    #             "content": result
-    #         },
-    #         "error": None
-    #     }
-    # }
-    return Response(status_code=200, content=result)
-
-@router.delete("/admin-profile-image-delete/{file_collection}", dependencies=[Depends(JWTBearer())], tags=["Super Admin"])
-async def admin_profile_image_delete(file_collection : str,admin_id : int, token = Depends(JWTBearer()), db : Session=Depends(get_db), mongo_db = Depends(get_mongo_db)):
-
-    crud.check_super_admin(db, token)
-    admin_profile = crud.check_admin_by_admin_id(db = db, admin_id = admin_id)
+
+    return file_storage.file_response(request, grid_out)
+
+@router.delete("/admin-profile-image-delete/{file_collection}", tags=["Super Admin"])
+async def admin_profile_image_delete(file_collection : str,admin_id : int, principal : Principal = Depends(get_current_user), db : AsyncSession=Depends(get_async_db), mongo_db = Depends(get_mongo_db)):
+
+    crud.check_super_admin(principal)
+    admin_profile = await crud.check_admin_by_admin_id(db = db, admin_id = admin_id)
     if not admin_profile :
         raise HTTPException(
             status_code=404,
@@ -797,7 +682,7 @@ async def admin_profile_image_delete(file_collection : str,admin_id : int, token
 
         file_id = admin_profile.profile_image
 
-        exists = crud.check_if_file_exists(mongo_db, file_collection, file_id)
+        exists = file_storage.file_exists(mongo_db, file_collection, file_id)
         if not exists:
             raise HTTPException (
                 status_code = 404,
@@ -812,7 +697,7 @@ async def admin_profile_image_delete(file_collection : str,admin_id : int, token
                     }
                 },
             )
-        result = crud.delete_file(mongo_db, file_collection, file_id)
+        result = file_storage.delete_file(mongo_db, file_collection, file_id)
         if not result:
             raise HTTPException (
                 status_code = 500,
@@ -828,7 +713,7 @@ async def admin_profile_image_delete(file_collection : str,admin_id : int, token
                 },
             )
         update_data = {"profile_image" : None}
-        update_profile_info = crud.update_profile(db=db, user_id= admin_profile.users_id, update_data= update_data)
+        update_profile_info = await crud.update_profile(db=db, user_id= admin_profile.users_id, update_data= update_data)
         if not update_profile_info:
             raise HTTPException (
                 status_code = 400,
@@ -856,4 +741,11 @@ async def admin_profile_image_delete(file_collection : str,admin_id : int, token
             }
         }
 
-    
\ No newline at end of file
+    
+
+
+@router.get("/password-pool-stats", tags = ["Super Admin"])
+async def password_pool_stats(principal : Principal = Depends(get_current_user)):
+    """ Queue depth and job counts of this worker's password hashing executor """
+    crud.check_super_admin(principal)
+    return success_response("Password pool stats", stats = password.password_pool_stats())
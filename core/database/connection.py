@@ -1,14 +1,16 @@
+import threading
 from functools import lru_cache
-from pymongo import MongoClient
 
-import sqlalchemy
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from config.base import settings
-
-metadata = sqlalchemy.MetaData()
+from core.database import replicas
+from core.database.engine import create_db_engine, create_async_db_engine
 
 
 @lru_cache()
@@ -17,9 +19,7 @@ def get_settings():
 
 
 
-engine = create_engine(settings.DB_URL)
-
-metadata.create_all(engine)
+engine = create_db_engine(settings.DB_URL)
 
 session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -34,15 +34,101 @@ def get_db():
         db.close()
 
 
+async_drivers = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def get_async_db_url():
+    """ ASYNC_DB_URL if set, otherwise DB_URL with the driver switched to asyncpg """
+    if settings.ASYNC_DB_URL:
+        return settings.ASYNC_DB_URL
+    url = make_url(settings.DB_URL)
+    return url.set(drivername=async_drivers.get(url.drivername, url.drivername))
+
+
+class PrimarySession(Session):
+    pass
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def keep_reads_on_primary(session):
+    replicas.mark_write(session.info.get("request_state"))
+
+
+async_engine = create_async_db_engine(get_async_db_url())
+
+async_session_local = sessionmaker(
+    bind=async_engine, class_=AsyncSession, sync_session_class=PrimarySession,
+    autocommit=False, autoflush=False, expire_on_commit=False
+)
+
+
+async def get_async_db(request : Request):
+    async with async_session_local() as db:
+        db.info["request_state"] = request.scope.setdefault("state", {})
+        yield db
+
+
+async def get_read_db(request : Request):
+    """
+    Session for read only endpoints. Goes to a read replica when one is
+    configured and reachable, otherwise to the primary. A client that
+    committed a write within DB_REPLICA_STICKY_SECONDS reads from the primary,
+    so it sees its own change even if the replicas lag behind. The client
+    carries that as a cookie, see replicas.StickyReadMiddleware.
+    """
+    db = None
+    if len(replicas.replica_set) and not replicas.is_sticky(request):
+        db = await replicas.replica_set.session()
+    if db is None:
+        db = async_session_local()
+        db.info["request_state"] = request.scope.setdefault("state", {})
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 def create_tables():
     print("create_tables")
     Base.metadata.create_all(bind=engine)
 
+mongo_client = None
+mongo_lock = threading.Lock()
+
+
+def connect_mongo():
+    """
+    Creates the worker wide MongoClient on first use, the client keeps its
+    own connection pool for every request. pymongo is only imported here, so
+    workers that never touch files don't load it.
+    """
+    global mongo_client
+    with mongo_lock:
+        if mongo_client is not None:
+            return mongo_client
+        from pymongo import MongoClient
+        mongo_client = MongoClient(
+            settings.MONGO_CONN_STR,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        )
+        return mongo_client
+
+
+def close_mongo():
+    global mongo_client
+    if mongo_client is not None:
+        mongo_client.close()
+        mongo_client = None
+
+
 def get_mongo_db():
-    mongo_client = MongoClient(settings.MONGO_CONN_STR)
-    mongo_db_name = settings.MONGO_DB_NAME
-    mongo_db = mongo_client[mongo_db_name]
-    try:
-        yield mongo_db
-    finally:
-        mongo_client.close()
\ No newline at end of file
+    client = mongo_client or connect_mongo()
+    yield client[settings.MONGO_DB_NAME]
@@ -0,0 +1,55 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config.base import settings
+
+
+def engine_options(url, pool_size : int, max_overflow : int) -> dict:
+    """
+    Pool and connection options for an engine on the given url.
+    Every Postgres connection gets the application_name and a server side
+    statement_timeout, so a runaway query is cancelled by the database.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "postgresql":
+        return {}
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "server_settings": {
+                "application_name": settings.DB_APPLICATION_NAME,
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+            }
+        }
+    else:
+        options["connect_args"] = {
+            "application_name": settings.DB_APPLICATION_NAME,
+            "options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}",
+        }
+    return options
+
+
+def create_db_engine(url):
+    """ Sync engine, only used by background jobs like the email outbox worker """
+    return create_engine(url, **engine_options(url, settings.DB_SYNC_POOL_SIZE, settings.DB_SYNC_MAX_OVERFLOW))
+
+
+def create_async_db_engine(url):
+    """ Async engine serving the requests """
+    return create_async_engine(url, **engine_options(url, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW))
+
+
+def connections_per_worker() -> int:
+    """ Most connections one worker process can hold open across both engines """
+    return settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW + settings.DB_SYNC_POOL_SIZE + settings.DB_SYNC_MAX_OVERFLOW
+
+
+def connection_budget(workers : int) -> int:
+    return workers * connections_per_worker()
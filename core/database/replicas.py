@@ -0,0 +1,92 @@
+import itertools
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from config.base import settings
+from core.database.engine import create_async_db_engine
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaSet:
+    """
+    Read replicas of the primary. Sessions are handed out round-robin,
+    a replica that fails to connect is skipped for DB_REPLICA_RETRY_SECONDS.
+    """
+
+    def __init__(self, urls):
+        self.sessionmakers = [
+            sessionmaker(bind=create_async_db_engine(url), class_=AsyncSession,
+                         autocommit=False, autoflush=False, expire_on_commit=False)
+            for url in urls
+        ]
+        self.down_until = [0.0] * len(urls)
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.sessionmakers)
+
+    def candidates(self):
+        """ Healthy replicas starting from the next one in turn """
+        now = time.monotonic()
+        start = next(self.counter)
+        for offset in range(len(self)):
+            index = (start + offset) % len(self)
+            if self.down_until[index] <= now:
+                yield index
+
+    async def session(self):
+        """ Returns a session on a healthy replica, or None if none can be reached """
+        for index in self.candidates():
+            db = self.sessionmakers[index]()
+            try:
+                await db.connection()
+                return db
+            except Exception as e:
+                logger.warning("read replica %s unavailable: %s", index, e)
+                self.down_until[index] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+                await db.close()
+        return None
+
+
+replica_set = ReplicaSet(settings.DB_REPLICA_URLS)
+
+# Set on the response of a request that committed a write. It lives with the
+# client, so its next reads stay on the primary whichever worker serves them.
+sticky_cookie = "read_primary"
+
+
+def mark_write(state : dict):
+    """ Records in the request state that the request committed a write """
+    if state is not None:
+        state["primary_write"] = True
+
+
+def is_sticky(request) -> bool:
+    """ Whether the client committed a write within DB_REPLICA_STICKY_SECONDS """
+    return sticky_cookie in request.cookies
+
+
+class StickyReadMiddleware:
+    """
+    Adds the sticky cookie, valid for DB_REPLICA_STICKY_SECONDS, to the
+    response of every request that committed a write on the primary.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not len(replica_set):
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and scope.get("state", {}).get("primary_write"):
+                cookie = f"{sticky_cookie}=1; Max-Age={settings.DB_REPLICA_STICKY_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
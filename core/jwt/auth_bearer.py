@@ -2,6 +2,7 @@ from fastapi import Request, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from core.jwt.auth_handler import decode_token
+from core.jwt.revocation import is_revoked
 
 
 class JWTBearer(HTTPBearer):
@@ -13,19 +14,25 @@ class JWTBearer(HTTPBearer):
         if credentials:
             if not credentials.scheme == "Bearer":
                 raise HTTPException(status_code=403, detail="Invalid authentication scheme.")
-            if not self.verify_jwt(credentials.credentials):
+            payload = self.verify_jwt(credentials.credentials)
+            if not payload:
                 raise HTTPException(status_code=403, detail="Invalid token or expired token.")
+            if payload.get("scope") == "refresh_token":
+                # refresh tokens used to be JWTs signed with the same key
+                raise HTTPException(status_code=403, detail="Invalid token or expired token.")
+            if await is_revoked(payload.get("jti")):
+                raise HTTPException(status_code=403, detail="Token has been revoked.")
+            request.state.token_payload = payload
             return credentials.credentials
         else:
             raise HTTPException(status_code=403, detail="Invalid authorization code.")
 
-    def verify_jwt(self, jwtoken: str) -> bool:
-        isTokenValid: bool = False
-
+    def verify_jwt(self, jwtoken: str):
         try:
             payload = decode_token(jwtoken)
         except:
             payload = None
-        if payload:
-            isTokenValid = True
-        return isTokenValid
+        return payload
+
+
+jwt_bearer = JWTBearer()
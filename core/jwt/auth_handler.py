@@ -1,9 +1,16 @@
 import datetime
+import hashlib
+import hmac
+import secrets
+import time
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from fastapi import HTTPException
-from jose import jwt,JWTError
+from functools import lru_cache
+from jose.exceptions import JWTError
 from typing import Dict
+from uuid import uuid4
 
 from config.base import settings
 
@@ -11,55 +18,69 @@ secret = settings.JWT_SECRET_KEY
 day = settings.JWT_TOKEN_EXPIRY_DAYS
 algorithm = settings.ALGORITHM
 
+@lru_cache()
+def get_jwt():
+    # jose.jwt pulls in the crypto backends, load it on the first token
+    from jose import jwt
+    return jwt
+
 def token_response(token: str):
     return {
         "access_token": token
     }
 
-def encode_token(user_id):
+def encode_token(user_id, family_id : str = None):
     payload = {
         'exp': datetime.utcnow() + timedelta(days=day, minutes=0),
         'iat': datetime.utcnow(),
+        'jti': uuid4().hex,
         'sub': user_id
     }
-    token = jwt.encode(
+    if family_id:
+        # the refresh token family the token was issued with, revoked on logout
+        payload['fid'] = family_id
+    token = get_jwt().encode(
         payload,
         secret ,
         algorithm
     )
     return token
 
-def decode_token(token):
-    try:
-        payload = jwt.decode(token, secret, algorithm)
-        return payload
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail=str(e))
+# Verified tokens by sha256, each kept until its exp. Bounded to
+# JWT_CACHE_SIZE entries, the least recently used one is dropped first.
+_verified_tokens = OrderedDict()
 
-def refresh_token(user_id):
-    payload = {
-        'exp': datetime.utcnow() + timedelta(days=365, minutes=0),
-        'iat': datetime.utcnow(),
-        'scope' : 'refresh_token',
-        'sub': user_id
-    }
-    return jwt.encode(
-        payload,
-        secret ,
-        algorithm
-    )
 
-def refresh_access_token(refresh_token):
+def decode_token(token):
+    """
+    Verifies the token and returns its payload. A token that verified before
+    is answered from the cache until it expires, without checking the
+    signature again. The returned payload is shared, don't modify it.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    cached = _verified_tokens.get(key)
+    if cached is not None:
+        payload, expires = cached
+        if expires > time.time():
+            _verified_tokens.move_to_end(key)
+            return payload
+        del _verified_tokens[key]
     try:
-        payload = jwt.decode(refresh_token, secret, algorithm)
-
-        if (payload['scope'] == 'refresh_token'):
-            user_id = payload['sub']
-            new_token = encode_token(user_id=user_id)
-            return token_response(new_token)
-
-        raise HTTPException(status_code=401, detail='Invalid scope for token')
-
+        payload = get_jwt().decode(token, secret, algorithm)
     except JWTError as e:
         raise HTTPException(status_code=401, detail=str(e))
+    if settings.JWT_CACHE_SIZE > 0 and payload.get('exp'):
+        _verified_tokens[key] = (payload, payload['exp'])
+        if len(_verified_tokens) > settings.JWT_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+    return payload
+
+def new_refresh_token() -> str:
+    """
+    Refresh tokens are opaque random strings. Only their hash is stored, see
+    hash_refresh_token, so a leaked table can't be used to refresh.
+    """
+    return secrets.token_urlsafe(32)
 
+def hash_refresh_token(token : str) -> str:
+    return hmac.new(settings.JWT_REFRESH_SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
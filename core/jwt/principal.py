@@ -0,0 +1,48 @@
+from typing import FrozenSet
+
+from fastapi import Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.api.sales_person.crud import get_user_with_roles
+from core.database.connection import get_read_db
+from core.jwt.auth_bearer import jwt_bearer
+
+
+class Principal(BaseModel):
+    id : int
+    email : str
+    # a user can hold several roles, check membership
+    role_ids : FrozenSet[int]
+    blocked : bool
+
+
+async def get_current_user(request : Request, token = Depends(jwt_bearer), db : AsyncSession = Depends(get_read_db)) -> Principal:
+    """
+    Resolves the authenticated user of the request. The token is decoded once
+    by JWTBearer and the user is loaded together with its roles in one query,
+    so routers can check roles without going back to the database.
+
+    """
+    payload = request.state.token_payload
+    rows = await get_user_with_roles(db, payload['sub'])
+    # Give the connection back before the handler runs. Write handlers use
+    # their own session, holding this one too would take two per request.
+    await db.close()
+    if not rows:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "status" : "Error",
+                "status_code" : 404,
+                "data" : None,
+                "error" : {
+                    "status_code":404,
+                    "status":'Error', 
+                    "message" : "User not found."
+                }
+            }
+        )
+    user = rows[0]
+    role_ids = frozenset(row.role_id for row in rows if row.role_id is not None)
+    return Principal(id = user.id, email = user.email, role_ids = role_ids, blocked = bool(user.blocked))
@@ -0,0 +1,147 @@
+"""
+Revoked tokens.
+
+The jti of a revoked token is stored in the revoked_tokens table until the
+token would have expired anyway. Every worker keeps a bloom filter of the
+revoked jtis which is topped up every JWT_REVOCATION_REFRESH_SECONDS, so a
+token that isn't in the filter is known to be valid without asking the
+database. Only a hit in the filter, a real revocation or a false positive,
+is confirmed against the table. A revocation made by another worker is seen
+here after at most one refresh interval.
+"""
+import asyncio
+import datetime
+import hashlib
+import logging
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.base import settings
+from core.database.connection import async_session_local
+from core.models.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# rows are read again for this long after a refresh, so a revocation
+# committed late or stamped by a worker with a slightly different clock
+# isn't missed
+refresh_overlap = datetime.timedelta(seconds=60)
+
+
+class BloomFilter:
+
+    def __init__(self, bits : int, hashes : int):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray((bits + 7) // 8)
+
+    def positions(self, key : str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key : str):
+        for position in self.positions(key):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key : str) -> bool:
+        return all(self.array[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class RevocationList:
+    """
+    Bloom filter of the revoked jtis of this worker. Until the first load
+    succeeded every token is checked against the database.
+    """
+
+    def __init__(self):
+        self.bloom = self.new_bloom()
+        self.loaded = False
+        self.refreshed_at = None
+        self.rebuilt_at = 0.0
+        # jtis revoked in this worker while a new filter is being built
+        self.added_during_rebuild = None
+
+    def new_bloom(self) -> BloomFilter:
+        return BloomFilter(settings.JWT_REVOCATION_BLOOM_BITS, settings.JWT_REVOCATION_BLOOM_HASHES)
+
+    def add(self, jti : str):
+        self.bloom.add(jti)
+        if self.added_during_rebuild is not None:
+            self.added_during_rebuild.append(jti)
+
+    def might_be_revoked(self, jti : str) -> bool:
+        return not self.loaded or jti in self.bloom
+
+    async def refresh(self, db : AsyncSession, full : bool = False):
+        """
+        Adds the jtis revoked since the last refresh to the filter. A full
+        refresh builds a new filter from the unexpired rows, which drops the
+        expired ones, and deletes the expired rows from the table.
+        """
+        now = datetime.datetime.utcnow()
+        query = select(RevokedToken.jti).where(RevokedToken.expires_at > now)
+        full = full or not self.loaded
+        if not full:
+            query = query.where(RevokedToken.created_at >= self.refreshed_at - refresh_overlap)
+            for jti in (await db.execute(query)).scalars():
+                self.bloom.add(jti)
+            self.refreshed_at = now
+            return
+
+        self.added_during_rebuild = []
+        try:
+            bloom = self.new_bloom()
+            for jti in (await db.execute(query)).scalars():
+                bloom.add(jti)
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            await db.commit()
+            for jti in self.added_during_rebuild:
+                bloom.add(jti)
+        finally:
+            self.added_during_rebuild = None
+        self.bloom = bloom
+        self.loaded = True
+        self.refreshed_at = now
+        self.rebuilt_at = time.monotonic()
+
+
+revocation_list = RevocationList()
+
+
+async def is_revoked(jti : str) -> bool:
+    """ Tokens issued before jtis were added have none and can't be revoked """
+    if not jti or not revocation_list.might_be_revoked(jti):
+        return False
+    async with async_session_local() as db:
+        found = await db.execute(select(RevokedToken.id).where(RevokedToken.jti == jti))
+        return found.first() is not None
+
+
+def revoke(db : AsyncSession, jti : str, expires_at : datetime.datetime):
+    """
+    Adds the token to the revoked tokens, the caller commits. The local
+    filter is updated right away, other workers pick it up on their next
+    refresh.
+    """
+    now = datetime.datetime.utcnow()
+    db.add(RevokedToken(jti = jti, expires_at = expires_at, created_at = now, updated_at = now))
+    revocation_list.add(jti)
+
+
+async def run_revocation_refresher(stop : asyncio.Event):
+    """ Keeps the revocation filter of this worker up to date until stop is set """
+    while not stop.is_set():
+        full = time.monotonic() - revocation_list.rebuilt_at >= settings.JWT_REVOCATION_REBUILD_SECONDS
+        try:
+            async with async_session_local() as db:
+                await revocation_list.refresh(db, full = full)
+        except Exception as e:
+            logger.exception("token revocation refresh failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.JWT_REVOCATION_REFRESH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 
 from core.database.connection import Base
 from core.models.mixin import TimeStamp
@@ -16,4 +16,46 @@ class IDProofs(Base, TimeStamp):
 
     __tablename__ = "id_proofs"
     id = Column(Integer, primary_key = True)
-    id_type = Column(String(30), nullable = False, unique = True)
\ No newline at end of file
+    id_type = Column(String(30), nullable = False, unique = True)
+
+class EmailOutbox(Base, TimeStamp):
+
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key = True)
+    to_email = Column(String(100), nullable = False)
+    subject = Column(String(200))
+    title = Column(String(200))
+    action = Column(String(100))
+    action_url = Column(String(1024))
+    message1 = Column(Text)
+    message2 = Column(Text)
+    support_url = Column(String(1024))
+    status = Column(String(10), nullable = False, default = "pending")
+    attempts = Column(Integer, nullable = False, default = 0)
+    next_attempt_at = Column(DateTime, nullable = False)
+    last_error = Column(Text)
+    sent_at = Column(DateTime)
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+class RevokedToken(Base, TimeStamp):
+
+    __tablename__ = "revoked_tokens"
+    id = Column(Integer, primary_key = True)
+    jti = Column(String(32), nullable = False, unique = True)
+    expires_at = Column(DateTime, nullable = False)
+    __table_args__ = (
+        Index("ix_revoked_tokens_created_at", "created_at"),
+    )
+
+class RefreshToken(Base, TimeStamp):
+
+    __tablename__ = "refresh_tokens"
+    id = Column(Integer, primary_key = True)
+    users_id = Column(Integer, ForeignKey("users.id"), nullable = False)
+    family_id = Column(String(32), nullable = False, index = True)
+    token_hash = Column(String(64), nullable = False, unique = True)
+    expires_at = Column(DateTime, nullable = False)
+    used_at = Column(DateTime, nullable = True)
+    revoked_at = Column(DateTime, nullable = True)
@@ -0,0 +1,171 @@
+"""
+Daily rollup of sales person time tracking.
+
+sales_person_daily_activity holds the logged in seconds and the number of
+sessions of every sales person per day, plus the week (monday) and month
+(first day) the day belongs to, so reports group by plain columns and read
+a few rows per user instead of scanning the raw sessions.
+
+The rollup is updated in the transaction that ends a session, see
+add_session. A session running past midnight adds its seconds to each day
+it covers and counts as a session on the day it started.
+
+Rows recorded before that, or rollups that need rebuilding, are handled by
+the backfill job:
+
+    python -m core.utils.activity_rollup [--since YYYY-MM-DD]
+"""
+import argparse
+import asyncio
+import datetime
+import math
+from collections import defaultdict
+
+from sqlalchemy import bindparam, delete, func, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.api.sales_person.models import SalesPersonDailyActivity, SalesPersonTimeTracking
+from core.database.connection import async_session_local
+
+dialect_inserts = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def week_start(day : datetime.date) -> datetime.date:
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def month_start(day : datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def seconds_of_day(value : datetime.time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def legacy_session_seconds(log_in_time : datetime.time, log_out_time : datetime.time) -> int:
+    """
+    Length of a session recorded before durations were stored. Only the
+    times of day are known, one that ended past midnight wraps around.
+    """
+    return (seconds_of_day(log_out_time) - seconds_of_day(log_in_time)) % 86400
+
+
+def split_session(start : datetime.datetime, seconds : int):
+    """ Yields (day, seconds) for every day the session covers """
+    if seconds <= 0:
+        yield start.date(), 0
+        return
+    day = start.date()
+    left_today = 86400 - seconds_of_day(start.time())
+    while seconds > 0:
+        segment = min(seconds, left_today)
+        yield day, segment
+        seconds -= segment
+        day += datetime.timedelta(days=1)
+        left_today = 86400
+
+
+async def add_daily_activity(db : AsyncSession, users_id : int, day : datetime.date, seconds : int, sessions : int):
+    insert = dialect_inserts[db.bind.dialect.name]
+    statement = insert(SalesPersonDailyActivity).values(
+        users_id = users_id, date = day, week = week_start(day), month = month_start(day),
+        active_seconds = seconds, sessions = sessions)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements = [SalesPersonDailyActivity.users_id, SalesPersonDailyActivity.date],
+        set_ = {
+            "active_seconds": SalesPersonDailyActivity.active_seconds + statement.excluded.active_seconds,
+            "sessions": SalesPersonDailyActivity.sessions + statement.excluded.sessions,
+        }))
+
+
+async def add_session(db : AsyncSession, users_id : int, start : datetime.datetime, seconds : int):
+    """ Adds an ended session to the rollups, the caller commits """
+    for index, (day, day_seconds) in enumerate(split_session(start, seconds)):
+        await add_daily_activity(db, users_id, day, day_seconds, 1 if index == 0 else 0)
+
+
+async def backfill_durations(db : AsyncSession, batch_size : int = 1000) -> int:
+    """ Sets duration_seconds of the ended sessions recorded without one """
+    filled = 0
+    while True:
+        rows = (await db.execute(
+            select(SalesPersonTimeTracking.id, SalesPersonTimeTracking.log_in_time, SalesPersonTimeTracking.log_out_time)
+            .where(SalesPersonTimeTracking.duration_seconds.is_(None),
+                   SalesPersonTimeTracking.log_in_time.isnot(None),
+                   SalesPersonTimeTracking.log_out_time.isnot(None))
+            .limit(batch_size))).all()
+        if not rows:
+            return filled
+        await db.execute(
+            update(SalesPersonTimeTracking)
+            .where(SalesPersonTimeTracking.id == bindparam("row_id"))
+            .values(duration_seconds = bindparam("seconds"))
+            .execution_options(synchronize_session=False),
+            [{"row_id": row.id, "seconds": legacy_session_seconds(row.log_in_time, row.log_out_time)} for row in rows])
+        await db.commit()
+        filled += len(rows)
+
+
+async def rebuild_rollups(db : AsyncSession, since : datetime.date = None) -> int:
+    """
+    Recomputes the rollups of the days from since on, all of them by
+    default. Returns the number of rollup rows written.
+    """
+    if db.bind.dialect.name == "postgresql":
+        # logouts wait for the rebuild instead of adding to rows about to be replaced
+        await db.execute(text("LOCK TABLE sales_person_daily_activity IN EXCLUSIVE MODE"))
+    query = select(SalesPersonTimeTracking.users_id, SalesPersonTimeTracking.date,
+                   SalesPersonTimeTracking.log_in_time, SalesPersonTimeTracking.duration_seconds)\
+        .where(SalesPersonTimeTracking.duration_seconds.isnot(None))
+    if since:
+        # sessions started before since can still run into it
+        longest = (await db.execute(select(func.max(SalesPersonTimeTracking.duration_seconds)))).scalar() or 0
+        lookback = datetime.timedelta(days=math.ceil(longest / 86400))
+        query = query.where(SalesPersonTimeTracking.date >= since - lookback)
+
+    totals = defaultdict(lambda: [0, 0])
+    sessions = await db.stream(query.execution_options(yield_per=1000))
+    async for users_id, date, log_in_time, duration_seconds in sessions:
+        start = datetime.datetime.combine(date, log_in_time)
+        for index, (day, seconds) in enumerate(split_session(start, duration_seconds)):
+            if since and day < since:
+                continue
+            total = totals[(users_id, day)]
+            total[0] += seconds
+            total[1] += 1 if index == 0 else 0
+
+    statement = delete(SalesPersonDailyActivity)
+    if since:
+        statement = statement.where(SalesPersonDailyActivity.date >= since)
+    await db.execute(statement)
+    db.add_all(
+        SalesPersonDailyActivity(users_id = users_id, date = day, week = week_start(day), month = month_start(day),
+                                 active_seconds = active_seconds, sessions = count)
+        for (users_id, day), (active_seconds, count) in totals.items()
+    )
+    await db.commit()
+    return len(totals)
+
+
+async def backfill(since : datetime.date = None):
+    async with async_session_local() as db:
+        filled = await backfill_durations(db)
+        print(f"durations filled: {filled}")
+        written = await rebuild_rollups(db, since)
+        print(f"rollup rows written: {written}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill session durations and rebuild the daily activity rollups")
+    parser.add_argument("--since", type=datetime.date.fromisoformat, default=None,
+                        help="only rebuild the days from this date on (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+    asyncio.run(backfill(args.since))
+
+
+if __name__ == "__main__":
+    main()
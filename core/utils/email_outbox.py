@@ -0,0 +1,143 @@
+"""
+Outbound email queue.
+
+Emails are written to the email_outbox table in the same transaction as the
+change that triggers them and are delivered later by a background worker,
+so request handlers never wait for the mail provider.
+"""
+import asyncio
+import datetime
+import logging
+import smtplib
+from email.message import EmailMessage
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from config.base import settings
+from core.database.connection import session_local
+from core.models.models import EmailOutbox
+from core.utils import sendgrid_service
+from core.utils.otp_and_password_html import create_otp_template
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(db : AsyncSession, to_email : str, title=None, subject=None, action=None, message1=None,
+                  message2=None, action_url=None, support_url=None):
+    """
+    Adds an email to the outbox. The caller commits, so the email is only
+    sent if the surrounding transaction succeeds.
+    """
+    now = datetime.datetime.utcnow()
+    email = EmailOutbox(
+        to_email = to_email,
+        title = title,
+        subject = subject,
+        action = action,
+        message1 = message1,
+        message2 = message2,
+        action_url = action_url,
+        support_url = support_url,
+        status = "pending",
+        attempts = 0,
+        next_attempt_at = now,
+        created_at = now,
+        updated_at = now,
+    )
+    db.add(email)
+    return email
+
+
+class SendGridTransport:
+
+    def send(self, email : EmailOutbox):
+        res = sendgrid_service.send_email(email.to_email, title = email.title, subject = email.subject, action = email.action,
+                                          message1 = email.message1, message2 = email.message2,
+                                          action_url = email.action_url, support_url = email.support_url)
+        if res.status_code >= 300:
+            raise RuntimeError(f"sendgrid returned {res.status_code}")
+
+
+class SMTPTransport:
+    """ Plain SMTP delivery, e.g. to a local sink like MailHog or aiosmtpd in development and tests """
+
+    def __init__(self, host : str, port : int):
+        self.host = host
+        self.port = port
+
+    def send(self, email : EmailOutbox):
+        message = EmailMessage()
+        message["From"] = settings.SENDGRID_EMAIL or "noreply@localhost"
+        message["To"] = email.to_email
+        message["Subject"] = email.subject or ""
+        message.set_content(create_otp_template(title = email.title, subject = email.subject, action = email.action,
+                                                message1 = email.message1, message2 = email.message2,
+                                                action_url = email.action_url, support_url = email.support_url),
+                            subtype = "html")
+        with smtplib.SMTP(self.host, self.port, timeout = 10) as smtp:
+            smtp.send_message(message)
+
+
+def get_transport():
+    if settings.EMAIL_TRANSPORT == "smtp":
+        return SMTPTransport(settings.EMAIL_SMTP_HOST, settings.EMAIL_SMTP_PORT)
+    return SendGridTransport()
+
+
+def retry_delay(attempts : int) -> datetime.timedelta:
+    delay = settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return datetime.timedelta(seconds=min(delay, settings.EMAIL_RETRY_MAX_SECONDS))
+
+
+def deliver_batch(transport) -> int:
+    """
+    Sends one batch of due emails and returns how many were processed.
+    Rows are claimed with SKIP LOCKED so several workers can share the outbox.
+    """
+    db = session_local()
+    try:
+        now = datetime.datetime.utcnow()
+        batch = db.query(EmailOutbox)\
+            .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)\
+            .order_by(EmailOutbox.next_attempt_at)\
+            .limit(settings.EMAIL_BATCH_SIZE)\
+            .with_for_update(skip_locked=True).all()
+        for email in batch:
+            email.attempts += 1
+            email.updated_at = datetime.datetime.utcnow()
+            try:
+                transport.send(email)
+            except Exception as e:
+                logger.warning("email %s to %s failed (attempt %s): %s", email.id, email.to_email, email.attempts, e)
+                email.last_error = str(e)
+                if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    email.status = "failed"
+                    email.message2 = None
+                else:
+                    email.next_attempt_at = email.updated_at + retry_delay(email.attempts)
+            else:
+                email.status = "sent"
+                email.sent_at = email.updated_at
+                # the body can hold a generated password, don't keep it around
+                email.message2 = None
+        db.commit()
+        return len(batch)
+    finally:
+        db.close()
+
+
+async def run_outbox_worker(stop : asyncio.Event, transport = None):
+    """ Delivers outbox emails until stop is set """
+    transport = transport or get_transport()
+    while not stop.is_set():
+        try:
+            processed = await run_in_threadpool(deliver_batch, transport)
+        except Exception as e:
+            logger.exception("email outbox worker error: %s", e)
+            processed = 0
+        if processed < settings.EMAIL_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.EMAIL_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,64 @@
+"""
+Streaming exports of query results as CSV or NDJSON.
+
+Rows are fetched through a server side cursor EXPORT_BATCH_SIZE at a time
+and every batch is written to the response as soon as it arrives, so the
+worker holds one batch in memory however large the export is and the
+client gets the first bytes right away.
+"""
+import csv
+import datetime
+import io
+import json
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from config.base import settings
+
+export_formats = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def csv_chunk(rows, header = None) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def ndjson_chunk(rows, keys) -> str:
+    return "".join(json.dumps(dict(zip(keys, row)), default=json_default, ensure_ascii=False) + "\n" for row in rows)
+
+
+async def iter_export(db : AsyncSession, query : Select, export_format : str):
+    result = await db.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+    keys = list(result.keys())
+    if export_format == "csv":
+        # the header goes out even when there are no rows
+        yield csv_chunk([], keys)
+    async for rows in result.partitions():
+        if export_format == "csv":
+            yield csv_chunk(rows)
+        else:
+            yield ndjson_chunk(rows, keys)
+
+
+def export_response(db : AsyncSession, query : Select, export_format : str, filename : str) -> StreamingResponse:
+    """ Streams the rows of the query as an attachment named filename.csv or filename.ndjson """
+    return StreamingResponse(
+        iter_export(db, query, export_format),
+        media_type=export_formats[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
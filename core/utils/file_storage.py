@@ -0,0 +1,260 @@
+import re
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import HTTPException, Request, Response, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from config.base import settings
+
+range_pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+image_signatures = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def grid_fs(mongo_db, collection : str):
+    # pymongo's gridfs and bson are imported on first use, workers that never
+    # serve a file don't load them
+    import gridfs
+    return gridfs.GridFS(mongo_db, collection)
+
+
+def object_id(file_id : str):
+    from bson.objectid import ObjectId
+    return ObjectId(file_id)
+
+
+def upload_error(status_code : int, message : str) -> HTTPException:
+    return HTTPException (
+        status_code = status_code,
+        detail = {
+            "status": "Error",
+            "status_code" : status_code,
+            "data": None,
+            "error" : {
+                "status_code" : status_code,
+                "status":"Error",
+                "message" : message,
+            }
+        }
+    )
+
+
+def sniff_image_type(head : bytes):
+    """ Detects the image type from its magic bytes, returns None for anything else """
+    for signature, content_type in image_signatures:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+async def save_upload(mongo_db, collection : str, file_name : str, file_upload : UploadFile):
+    """
+    Copies the uploaded image into GridFS chunk by chunk.
+    The type is taken from the magic bytes of the content and the upload is
+    aborted as soon as it reaches UPLOAD_MAX_BYTES, so at most one chunk of
+    the image is held in memory. Returns the file id, or None if storing failed.
+    """
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    chunk = await file_upload.read(chunk_size)
+    if not chunk:
+        raise upload_error(400, "No file")
+    content_type = sniff_image_type(chunk)
+    if not content_type:
+        raise upload_error(400, "only image can upload")
+    try:
+        fs = grid_fs(mongo_db, collection)
+        grid_in = fs.new_file(filename=file_name, contentType=content_type, chunkSize=chunk_size)
+    except Exception as e:
+        print(e)
+        return None
+    size = 0
+    try:
+        while chunk:
+            size += len(chunk)
+            if size >= settings.UPLOAD_MAX_BYTES:
+                grid_in.abort()
+                raise upload_error(413, "Image size must be less than 6 mb")
+            grid_in.write(chunk)
+            chunk = await file_upload.read(chunk_size)
+        grid_in.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(e)
+        grid_in.abort()
+        return None
+    return grid_in._id
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects multipart bodies larger than max_body_size. A declared
+    Content-Length is checked before anything is read, otherwise the body is
+    counted while it streams in and the request fails once it passes the limit.
+    """
+
+    def __init__(self, app, max_body_size : int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/"):
+            return await self.app(scope, receive, send)
+
+        error = upload_error(413, "Request body too large")
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse(status_code=error.status_code, content={"detail": error.detail})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise error
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def open_file(mongo_db, collection : str, file_id : str):
+    """
+    Returns the GridOut of the file without reading its content,
+    or None if the id is invalid or the file doesn't exist.
+    """
+    try:
+        fs = grid_fs(mongo_db, collection)
+        return fs.get(object_id(file_id))
+    except Exception as e:
+        print(e)
+        return None
+
+
+def file_exists(mongo_db, collection : str, file_id : str):
+    try:
+        fs = grid_fs(mongo_db, collection)
+        return fs.exists(object_id(file_id))
+    except Exception as e:
+        print(e)
+
+
+def delete_file(mongo_db, collection : str, file_id : str):
+    try:
+        fs = grid_fs(mongo_db, collection)
+        fs.delete(object_id(file_id))
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+
+def iter_file(grid_out, start : int, end : int):
+    """ Yields the bytes start..end (inclusive) one GridFS chunk at a time """
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = grid_out.readchunk()
+        if not chunk:
+            break
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+
+
+def get_etag(grid_out) -> str:
+    if grid_out.md5:
+        return f'"{grid_out.md5}"'
+    return f'"{grid_out._id}-{grid_out.length}"'
+
+
+def parse_range(range_header : str, length : int):
+    """
+    Parses a single "bytes=start-end" range.
+    Returns (start, end) or None when the range can't be satisfied.
+    """
+    match = range_pattern.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start, end = match.group(1), match.group(2)
+    if start == "":
+        suffix = int(end)
+        if suffix == 0:
+            return None
+        return max(length - suffix, 0), length - 1
+    start = int(start)
+    end = min(int(end), length - 1) if end else length - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def not_modified(request : Request, etag : str, upload_date) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return upload_date.replace(microsecond=0) <= since
+    return False
+
+
+def file_response(request : Request, grid_out) -> Response:
+    """
+    Builds the response for a stored file. The content is streamed from GridFS
+    chunk by chunk, conditional requests get a 304 and a single byte range
+    gets a 206.
+    """
+    length = grid_out.length
+    upload_date = grid_out.upload_date
+    if upload_date.tzinfo is None:
+        upload_date = upload_date.replace(tzinfo=timezone.utc)
+    else:
+        upload_date = upload_date.astimezone(timezone.utc)
+    etag = get_etag(grid_out)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(upload_date, usegmt=True),
+        "Cache-Control": f"private, max-age={settings.FILE_CACHE_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+    }
+    if not_modified(request, etag, upload_date):
+        return Response(status_code=304, headers=headers)
+
+    start, end, status_code = 0, length - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, length) if length else None
+        if not byte_range:
+            headers["Content-Range"] = f"bytes */{length}"
+            return Response(status_code=416, headers=headers)
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(grid_out, start, end),
+        status_code=status_code,
+        media_type=grid_out.content_type or "application/octet-stream",
+        headers=headers,
+    )
@@ -0,0 +1,105 @@
+"""
+Measures /profile-image-download latency against the mongod of MONGO_CONN_STR.
+
+    python -m core.utils.mongo_benchmark --requests 200
+
+Stores a sample image in the sppi bucket, downloads it through the app with
+a MongoClient opened and closed per request, the way get_mongo_db used to
+work, and with the worker wide client, then deletes it again. Requests are
+sent one after the other straight to the ASGI app, so the figures are the
+server side latency without any HTTP client in between.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from config.base import settings
+from core.database import connection
+from core.utils import file_storage
+
+
+def per_request_mongo_db():
+    """ get_mongo_db before the shared client: a new MongoClient for every request """
+    from pymongo import MongoClient
+
+    client = MongoClient(settings.MONGO_CONN_STR)
+    try:
+        yield client[settings.MONGO_DB_NAME]
+    finally:
+        client.close()
+
+
+async def download(app, path : str) -> int:
+    """ Runs one GET through the app, returns the status """
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"benchmark")], "client": ("127.0.0.1", 0), "server": ("benchmark", 80)}
+    status = None
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # streaming responses listen for the client going away
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            finished.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path : str, requests : int):
+    """ Latencies of sequential downloads in milliseconds """
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        status = await download(app, path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if status != 200:
+            raise RuntimeError(f"download returned {status}")
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure /profile-image-download latency")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--size", type=int, default=100 * 1024, help="bytes of the sample image")
+    args = parser.parse_args(argv)
+
+    from main import app
+
+    mongo_db = connection.connect_mongo()[settings.MONGO_DB_NAME]
+    fs = file_storage.grid_fs(mongo_db, "sppi")
+    sample = b"\x89PNG\r\n\x1a\n" + bytes(args.size - 8)
+    file_id = fs.put(sample, filename="benchmark.png", contentType="image/png", chunkSize=settings.UPLOAD_CHUNK_SIZE)
+    path = f"/profile-image-download/sppi/{file_id}"
+    try:
+        print(f"{args.requests} downloads of {args.size} bytes from {settings.MONGO_CONN_STR}")
+        print(f"{'client':<20} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, override in [("per request", per_request_mongo_db), ("shared", None)]:
+            app.dependency_overrides.clear()
+            if override:
+                app.dependency_overrides[connection.get_mongo_db] = override
+            asyncio.run(measure(app, path, 5))
+            latencies = asyncio.run(measure(app, path, args.requests))
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{label:<20} {statistics.mean(latencies):>8.2f} {statistics.median(latencies):>8.2f} {p95:>8.2f}")
+    finally:
+        app.dependency_overrides.clear()
+        fs.delete(file_id)
+        connection.close_mongo()
+
+
+if __name__ == "__main__":
+    main()
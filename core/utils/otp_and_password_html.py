@@ -1,24 +1,57 @@
+import re
+from functools import lru_cache
 
+placeholder_pattern = re.compile(r"\$\{(\w+)\}")
 
-def get_action_template(action=None, action_url=None):
-    if action:
-        template = f"""<a href="{action_url}" style="background:#20e277;text-decoration:none !important; font-weight:500; margin-top:35px; color:#fff;text-transform:uppercase; 
-        font-size:14px;padding:10px 24px;display:inline-block;border-radius:50px;">{action}</a>"""
-    else:
-        template = ""
-    return template
 
+class Template:
+    """
+    A template parsed once into literal text and ${name} slots.
+    partial() fills some of the slots and returns a new, shorter template,
+    render() joins the remaining parts without reparsing anything.
+    """
 
-def create_otp_template(title=None, subject=None, action=None, message1=None, message2=None, action_url=None, support_url=None):
-    
-    action_template = get_action_template(action=action, action_url=action_url)
-    
-    html_content = f"""
+    def __init__(self, source=None, parts=None):
+        if parts is None:
+            parts = []
+            position = 0
+            for match in placeholder_pattern.finditer(source):
+                parts.append((True, source[position:match.start()]))
+                parts.append((False, match.group(1)))
+                position = match.end()
+            parts.append((True, source[position:]))
+        self.parts = parts
+
+    def partial(self, **values):
+        parts = []
+        for is_literal, value in self.parts:
+            if not is_literal and value in values:
+                is_literal, value = True, str(values[value])
+            if is_literal and parts and parts[-1][0]:
+                parts[-1] = (True, parts[-1][1] + value)
+            else:
+                parts.append((is_literal, value))
+        return Template(parts=parts)
+
+    def render(self, **values):
+        return "".join([value if is_literal else str(values[value]) for is_literal, value in self.parts])
+
+
+# Templates are compiled once at import and addressed by (name, version).
+# Bump the version instead of editing a template in place so mails rendered
+# from the cache never mix two layouts.
+ACTION_TEMPLATES = {
+    ("action_button", 1): Template("""<a href="${action_url}" style="background:#20e277;text-decoration:none !important; font-weight:500; margin-top:35px; color:#fff;text-transform:uppercase; 
+        font-size:14px;padding:10px 24px;display:inline-block;border-radius:50px;">${action}</a>"""),
+}
+
+EMAIL_TEMPLATES = {
+    ("otp", 1): Template("""
     <html lang="en-US">
     <head>
         <meta content="text/html; charset=utf-8" http-equiv="Content-Type" />
-        <title>{title}</title>
-        <meta name="description" content="{title}">
+        <title>${title}</title>
+        <meta name="description" content="${title}">
     </head>
     <body marginheight="0" topmargin="0" marginwidth="0" style="margin: 0px; background-color: #f2f3f8;" leftmargin="0">
         <!--100% body table-->
@@ -50,13 +83,13 @@ def create_otp_template(title=None, subject=None, action=None, message1=None, me
                                     </tr>
                                     <tr>
                                         <td style="padding:0 35px;">
-                                            <h1 style="color:#1e1e2d; font-weight:500; margin:0;font-size:32px;font-family:'Rubik',sans-serif;">{message1 if message1 else ""}</h1>
+                                            <h1 style="color:#1e1e2d; font-weight:500; margin:0;font-size:32px;font-family:'Rubik',sans-serif;">${message1}</h1>
                                             <span
                                                 style="display:inline-block; vertical-align:middle; margin:29px 0 26px; border-bottom:1px solid #cecece; width:100px;"></span>
                                             <p style="color:#455056; font-size:15px;line-height:24px; margin:0;">
-                                                {message2 if message2 else ""}
+                                                ${message2}
                                             </p>
-                                            {action_template}
+                                            ${action_template}
                                         </td>
                                     </tr>
                                     <tr>
@@ -69,7 +102,7 @@ def create_otp_template(title=None, subject=None, action=None, message1=None, me
                         </tr>
                         <tr>
                             <td style="text-align:center;">
-                                <p style="font-size:14px; color:rgba(69, 80, 86, 0.7411764705882353); line-height:18px; margin:0 0 0;">&copy; <strong>{support_url}</strong></p>
+                                <p style="font-size:14px; color:rgba(69, 80, 86, 0.7411764705882353); line-height:18px; margin:0 0 0;">&copy; <strong>${support_url}</strong></p>
                             </td>
                         </tr>
                         <tr>
@@ -82,7 +115,38 @@ def create_otp_template(title=None, subject=None, action=None, message1=None, me
         <!--/100% body table-->
     </body>
     </html>
+    """),
+}
+
+
+def get_action_template(action=None, action_url=None, version=1):
+    if action:
+        template = ACTION_TEMPLATES[("action_button", version)].render(action=action, action_url=action_url)
+    else:
+        template = ""
+    return template
+
+
+@lru_cache(maxsize=256)
+def prepare_template(name, version, title=None, action=None, action_url=None, support_url=None):
     """
-        
-    return html_content
-   
+    Substitutes the static parameters of a template and caches the result as
+    the text before, between and after the per recipient messages, so a send
+    only joins five strings.
+    """
+    action_template = get_action_template(action=action, action_url=action_url)
+    parts = EMAIL_TEMPLATES[(name, version)].partial(title=title, action_template=action_template, support_url=support_url).parts
+    slots = [value for is_literal, value in parts if not is_literal]
+    if slots != ["message1", "message2"]:
+        raise ValueError(f"template {name} v{version} must leave exactly message1 then message2 to fill, got {slots}")
+    return tuple(value for is_literal, value in parts if is_literal)
+
+
+def render_template(name, version, title=None, action=None, action_url=None, support_url=None, message1=None, message2=None):
+    prefix, middle, suffix = prepare_template(name, version, title, action, action_url, support_url)
+    return f"{prefix}{message1 or ''}{middle}{message2 or ''}{suffix}"
+
+
+def create_otp_template(title=None, subject=None, action=None, message1=None, message2=None, action_url=None, support_url=None):
+    return render_template("otp", 1, title=title, action=action, action_url=action_url, support_url=support_url,
+                           message1=message1, message2=message2)
@@ -0,0 +1,67 @@
+import time
+from typing import Any, List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from config.base import settings
+
+
+class Page(NamedTuple):
+    items : List[Any]
+    count : Optional[int]
+    next_cursor : Optional[int]
+    # the skip and limit actually applied, see page_bounds
+    skip : int
+    limit : int
+
+
+def page_bounds(skip : int, limit : int):
+    """ skip and limit clamped to 0.. and 0..PAGINATION_MAX_LIMIT """
+    return max(0, skip), max(0, min(limit, settings.PAGINATION_MAX_LIMIT))
+
+
+_count_cache = {}
+
+
+async def count_rows(db : AsyncSession, query : Select, cache_key : str = None) -> int:
+    """
+    Runs a COUNT(*) over the given query on the database side.
+    When cache_key is given the result is reused for PAGINATION_COUNT_TTL seconds.
+    """
+    now = time.monotonic()
+    if cache_key:
+        cached = _count_cache.get(cache_key)
+        if cached and cached[1] > now:
+            return cached[0]
+    count = (await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))).scalar()
+    if cache_key:
+        _count_cache[cache_key] = (count, now + settings.PAGINATION_COUNT_TTL)
+    return count
+
+
+def invalidate_count(cache_key : str):
+    _count_cache.pop(cache_key, None)
+
+
+async def paginate(db : AsyncSession, query : Select, key, key_name : str, skip : int = 0, limit : int = 10,
+                   cursor : int = None, include_count : bool = True, count_cache_key : str = None) -> Page:
+    """
+    Returns one page of the query.
+
+    With a cursor the page is fetched by keyset (key > cursor), otherwise by
+    LIMIT/OFFSET. Either way only the rows of the page are loaded. key is the
+    column the query is ordered by and key_name its name in the result rows,
+    used to build next_cursor.
+    """
+    skip, limit = page_bounds(skip, limit)
+    count = await count_rows(db, query, count_cache_key) if include_count else None
+    page_query = query.order_by(None).order_by(key)
+    if cursor is not None:
+        page_query = page_query.where(key > cursor)
+    else:
+        page_query = page_query.offset(skip)
+    items = (await db.execute(page_query.limit(limit))).all()
+    next_cursor = getattr(items[-1], key_name) if items and len(items) == limit else None
+    return Page(items = items, count = count, next_cursor = next_cursor, skip = skip, limit = limit)
@@ -1,23 +1,137 @@
 import re
 import random
 import array
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from passlib.context import CryptContext
+from functools import lru_cache
+
+from fastapi import HTTPException
 from config.base import settings
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_password_context():
+    """ The passlib context, built from HASH_POLICY the first time a password is hashed or checked """
+    from passlib.context import CryptContext
+
+    password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    if settings.HASH_POLICY:
+        password_context.load_path(settings.HASH_POLICY)
+    return password_context
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-if settings.HASH_POLICY:
-    password_context.load_path(settings.HASH_POLICY)
+# Roles hashed with their own bcrypt cost, the tiers are set in HASH_POLICY.
+# Every other role uses the default tier.
+role_categories = {1: "super_admin", 2: "admin"}
 
 
-def get_hashed_password(password: str) -> str:
-    return password_context.hash(password)
+def role_category(role_id : int):
+    return role_categories.get(role_id)
+
+
+def get_hashed_password(password: str, category : str = None) -> str:
+    return get_password_context().hash(password, category=category)
 
 
 def verify_password(password: str, hashed_pass: str) -> bool:
-    return password_context.verify(password, hashed_pass)
+    return get_password_context().verify(password, hashed_pass)
+
+
+def verify_and_update_password(password: str, hashed_pass: str, category : str = None):
+    """
+    Checks the password and returns (verified, new_hash). new_hash is set
+    when the stored hash doesn't meet the policy of the category anymore,
+    e.g. after its cost was raised, and should replace the stored one.
+    """
+    return get_password_context().verify_and_update(password, hashed_pass, category=category)
+
+
+# bcrypt is CPU bound, so hashing runs on its own small executor instead of
+# the event loop or Starlette's shared threadpool. Jobs beyond
+# PASSWORD_HASH_MAX_QUEUE are rejected so a login storm can't pile up work.
+password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+_stats_lock = threading.Lock()
+_stats = {"in_flight": 0, "running": 0, "completed": 0, "cancelled": 0, "rejected": 0}
+
+
+def password_pool_stats() -> dict:
+    """
+    Queue depth metrics of the password executor.
+    queued is the number of jobs waiting for a free worker.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queued"] = stats["in_flight"] - stats["running"]
+    stats["workers"] = settings.PASSWORD_HASH_WORKERS
+    stats["max_queue"] = settings.PASSWORD_HASH_MAX_QUEUE
+    return stats
+
+
+def _run_job(func, *args):
+    with _stats_lock:
+        _stats["running"] += 1
+    try:
+        return func(*args)
+    finally:
+        with _stats_lock:
+            _stats["running"] -= 1
+
+
+def _release(future):
+    # Runs once the job finished, or was cancelled while still queued
+    # because the request awaiting it went away.
+    with _stats_lock:
+        _stats["in_flight"] -= 1
+        _stats["cancelled" if future.cancelled() else "completed"] += 1
+
+
+async def _submit(func, *args):
+    with _stats_lock:
+        if _stats["in_flight"] >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+            _stats["rejected"] += 1
+            rejected = True
+        else:
+            _stats["in_flight"] += 1
+            rejected = False
+        queued = _stats["in_flight"] - _stats["running"]
+    if rejected:
+        logger.warning("password executor saturated: %s", password_pool_stats())
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "status" : "Error",
+                "status_code" : 503,
+                "data" : None,
+                "error" : {
+                    "status_code":503,
+                    "status":'Error',
+                    "message" : "Server busy, please try again"
+                }
+            }
+        )
+    if queued >= settings.PASSWORD_HASH_QUEUE_WARN:
+        # the queue is filling up, report it before jobs get rejected
+        logger.warning("password executor queue depth %s: %s", queued, password_pool_stats())
+    future = password_executor.submit(_run_job, func, *args)
+    future.add_done_callback(_release)
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password_async(password: str, category : str = None) -> str:
+    return await _submit(get_hashed_password, password, category)
+
+
+async def verify_password_async(password: str, hashed_pass: str) -> bool:
+    return await _submit(verify_password, password, hashed_pass)
+
+
+async def verify_and_update_password_async(password: str, hashed_pass: str, category : str = None):
+    return await _submit(verify_and_update_password, password, hashed_pass, category)
 
 
 def validate_password(password: str) -> bool:
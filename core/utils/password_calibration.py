@@ -0,0 +1,73 @@
+"""
+Measures what each bcrypt cost setting achieves on this machine.
+
+    python -m core.utils.password_calibration --target-ms 250
+
+Prints the verify latency and hashes per second of every rounds value in
+the range, the highest rounds that stays within the target latency, and
+the rounds each tier of HASH_POLICY currently uses. Run it on the
+production hardware, one hash keeps one core busy for its whole duration.
+"""
+import argparse
+import time
+
+from config.base import settings
+from core.utils.password import get_password_context
+
+
+def measure(rounds : int, min_seconds : float, min_samples : int) -> float:
+    """ Seconds per verify of a hash with the given rounds """
+    from passlib.hash import bcrypt
+
+    hashed = bcrypt.using(rounds=rounds).hash("calibration")
+    samples = 0
+    start = time.perf_counter()
+    while samples < min_samples or time.perf_counter() - start < min_seconds:
+        bcrypt.verify("calibration", hashed)
+        samples += 1
+    return (time.perf_counter() - start) / samples
+
+
+def policy_tiers() -> dict:
+    """ Default bcrypt rounds of HASH_POLICY per category, None is the default tier """
+    tiers = {}
+    for key, value in get_password_context().to_dict().items():
+        if key.endswith("bcrypt__default_rounds"):
+            category = key[:-len("bcrypt__default_rounds")].rstrip("_") or None
+            tiers[category] = int(value)
+    return tiers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure bcrypt cost settings on this machine")
+    parser.add_argument("--min-rounds", type=int, default=8)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--target-ms", type=float, default=250, help="acceptable verify latency")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="time spent measuring each setting")
+    parser.add_argument("--min-samples", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'rounds':>6} {'ms/verify':>10} {'hashes/s':>9}")
+    latencies = {}
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        seconds = measure(rounds, args.min_seconds, args.min_samples)
+        latencies[rounds] = seconds * 1000
+        print(f"{rounds:>6} {seconds * 1000:>10.1f} {1 / seconds:>9.1f}")
+        if seconds * 1000 > args.target_ms * 4:
+            # every further round doubles the time, nothing left to learn
+            break
+
+    within = [rounds for rounds, ms in latencies.items() if ms <= args.target_ms]
+    if within:
+        print(f"\nhighest rounds within {args.target_ms:g} ms: {max(within)}")
+    else:
+        print(f"\nno rounds value within {args.target_ms:g} ms")
+
+    print(f"\ntiers in {settings.HASH_POLICY}:")
+    for category, rounds in policy_tiers().items():
+        measured = f"{latencies[rounds]:.1f} ms" if rounds in latencies else "not measured"
+        print(f"  {category or 'default':<12} rounds {rounds:>2}  {measured}")
+
+
+if __name__ == "__main__":
+    main()
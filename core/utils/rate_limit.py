@@ -0,0 +1,178 @@
+"""
+Request rate limiting with sliding window counters.
+
+Each key has a counter for the current and the previous fixed window. The
+number of requests in the sliding window ending now is estimated as the
+previous count weighted by how much of it still overlaps, plus the current
+count. That needs two numbers per key, however many requests arrive.
+
+Counters are kept in memory per worker. With RATE_LIMIT_REDIS_URL set they
+are shared through redis instead (the optional redis package is imported
+on first use), and the in-memory counters stand in whenever redis can't be
+reached.
+
+RateLimit is a dependency. Declared before the db session and the request
+body, it rejects a request with a 429 before any query or password hash
+runs.
+"""
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+
+from config.base import settings
+
+logger = logging.getLogger(__name__)
+
+
+def sliding_count(previous : int, current : int, elapsed : float) -> float:
+    """ Requests in the sliding window, elapsed is the passed fraction of the current window """
+    return previous * (1 - elapsed) + current
+
+
+def retry_after(previous : int, current : int, elapsed : float, limit : int, window : int) -> int:
+    """ Seconds until the sliding count drops below limit again """
+    if current >= limit:
+        # only once the current window has become the previous one
+        needed = 1 + 1 - limit / current
+    else:
+        needed = 1 - (limit - current) / previous
+    return max(1, math.ceil((needed - elapsed) * window))
+
+
+class MemoryBackend:
+    """ Counters of this worker only """
+
+    def __init__(self, max_keys : int = 100000):
+        self.max_keys = max_keys
+        # key -> (window index, previous count, current count, expires)
+        self.counters = {}
+
+    def purge(self, now : float):
+        for expired in [key for key, counter in self.counters.items() if counter[3] <= now]:
+            del self.counters[expired]
+
+    async def hit(self, key : str, limit : int, window : int):
+        """ Counts a request, returns (allowed, retry after seconds) """
+        now = time.time()
+        index, elapsed = divmod(now / window, 1)
+        counter = self.counters.get(key)
+        if counter is None or counter[0] < index - 1:
+            previous, current = 0, 0
+        elif counter[0] == index - 1:
+            previous, current = counter[2], 0
+        else:
+            previous, current = counter[1], counter[2]
+        if sliding_count(previous, current, elapsed) >= limit:
+            return False, retry_after(previous, current, elapsed, limit, window)
+        if counter is None and len(self.counters) >= self.max_keys:
+            self.purge(now)
+        self.counters[key] = (index, previous, current + 1, (index + 2) * window)
+        return True, 0
+
+
+class RedisBackend:
+    """
+    Counters shared by all workers. Every request increments the counter of
+    its window, rejected ones included, so a client that keeps hammering
+    stays blocked. Falls back to the local counters when redis fails.
+    """
+
+    def __init__(self, url : str, fallback : MemoryBackend):
+        self.url = url
+        self.fallback = fallback
+        self.client = None
+        self.down_until = 0.0
+
+    def get_client(self):
+        if self.client is None:
+            import redis.asyncio as redis
+            self.client = redis.from_url(self.url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return self.client
+
+    async def hit(self, key : str, limit : int, window : int):
+        now = time.time()
+        if self.down_until > now:
+            return await self.fallback.hit(key, limit, window)
+        index, elapsed = divmod(now / window, 1)
+        current_key = f"ratelimit:{key}:{int(index)}"
+        try:
+            pipe = self.get_client().pipeline(transaction=False)
+            pipe.incr(current_key)
+            pipe.expire(current_key, window * 2)
+            pipe.get(f"ratelimit:{key}:{int(index) - 1}")
+            current, _, previous = await pipe.execute()
+        except Exception as e:
+            logger.warning("rate limit backend unavailable, using local counters: %s", e)
+            self.down_until = now + settings.RATE_LIMIT_REDIS_RETRY_SECONDS
+            return await self.fallback.hit(key, limit, window)
+        previous = int(previous or 0)
+        # current includes this request
+        if sliding_count(previous, current - 1, elapsed) >= limit:
+            return False, retry_after(previous, current - 1, elapsed, limit, window)
+        return True, 0
+
+
+def get_backend():
+    memory = MemoryBackend()
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisBackend(settings.RATE_LIMIT_REDIS_URL, memory)
+    return memory
+
+
+backend = get_backend()
+
+
+async def client_ip(request : Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+
+async def form_username(request : Request) -> Optional[str]:
+    """ The username field of a login form, read from the form FastAPI already parsed """
+    form = await request.form()
+    username = form.get("username")
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+
+class RateLimit:
+    """
+    Dependency allowing limit requests per window seconds for each key.
+    key returns the key of the request, e.g. client_ip, requests it
+    returns None for are not limited.
+    """
+
+    def __init__(self, name : str, limit : int, window : int, key : Callable[[Request], Awaitable[Optional[str]]] = client_ip):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.key = key
+
+    async def __call__(self, request : Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        key = await self.key(request)
+        if key is None:
+            return
+        allowed, retry = await backend.hit(f"{self.name}:{key}", self.limit, self.window)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "status" : "Error",
+                    "status_code" : 429,
+                    "data" : None,
+                    "error" : {
+                        "status_code":429,
+                        "status":'Error',
+                        "message" : "Too many requests, please try again later"
+                    }
+                },
+                headers={"Retry-After": str(retry)},
+            )
+
+
+login_ip_limit = RateLimit("login-ip", settings.RATE_LIMIT_LOGIN_IP_LIMIT, settings.RATE_LIMIT_LOGIN_IP_WINDOW)
+login_email_limit = RateLimit("login-email", settings.RATE_LIMIT_LOGIN_EMAIL_LIMIT, settings.RATE_LIMIT_LOGIN_EMAIL_WINDOW,
+                              key=form_username)
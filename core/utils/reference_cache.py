@@ -0,0 +1,78 @@
+"""
+Cache of near static reference tables (merchant stages, countries, id proofs,
+roles). A table is loaded on first use and the response built from it is kept
+as ready to send JSON bytes for REFERENCE_CACHE_TTL seconds, so dropdowns don't
+reach the database at all. Changes made through the ORM in this worker drop the
+cached entry right away; anything else is picked up when the TTL runs out.
+"""
+import asyncio
+import time
+from typing import Callable, NamedTuple
+
+from fastapi import Response
+from sqlalchemy import event, select
+
+from config.base import settings
+from core.api.sales_person.models import MerchantStages, Roles
+from core.database.connection import async_session_local
+from core.models.models import Country, IDProofs
+from core.utils.responses import dumps
+
+reference_tables = {
+    "merchant_stages": MerchantStages,
+    "country": Country,
+    "id_proofs": IDProofs,
+    "roles": Roles,
+}
+
+
+class CacheEntry(NamedTuple):
+    body : bytes
+    expires : float
+
+
+_cache = {}
+_locks = {name: asyncio.Lock() for name in reference_tables}
+
+
+def invalidate_reference(name : str = None):
+    """ Drops one cached table, or all of them """
+    if name is None:
+        _cache.clear()
+    else:
+        _cache.pop(name, None)
+
+
+def render_json(content) -> bytes:
+    """ Same encoding as APIResponse """
+    return dumps(content)
+
+
+async def reference_response(name : str, build : Callable) -> Response:
+    """
+    Returns the JSON response for a reference table. build gets the rows of
+    the table and returns the response content, it only runs when the cached
+    entry is missing or expired. A session is only opened in that case.
+    """
+    entry = _cache.get(name)
+    if entry is None or entry.expires <= time.monotonic():
+        async with _locks[name]:
+            entry = _cache.get(name)
+            if entry is None or entry.expires <= time.monotonic():
+                model = reference_tables[name]
+                async with async_session_local() as db:
+                    rows = (await db.execute(select(model).order_by(model.id))).scalars().all()
+                entry = CacheEntry(render_json(build(rows)), time.monotonic() + settings.REFERENCE_CACHE_TTL)
+                _cache[name] = entry
+    return Response(content=entry.body, media_type="application/json")
+
+
+def _listen(name : str, model):
+    def invalidate(mapper, connection, target):
+        invalidate_reference(name)
+    for event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, event_name, invalidate)
+
+
+for _name, _model in reference_tables.items():
+    _listen(_name, _model)
@@ -0,0 +1,133 @@
+"""
+Measures /token/refresh against /user_email_login on the database of ASYNC_DB_URL.
+
+    python -m core.utils.refresh_benchmark --email sales@example.com --password secret --requests 300
+
+Logs the given user in --logins times, then exchanges the last refresh token
+--requests times, each time with the token the previous refresh returned.
+Requests are sent one after the other straight to the ASGI app with the
+login rate limits switched off, so the figures are the server side cost of
+a password login and of a refresh. Every login and refresh stores a
+refresh token row, the logins and refreshes are revoked again at the end.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import time
+from urllib.parse import urlencode
+
+from sqlalchemy.engine import make_url
+
+from config.base import settings
+from core.utils import rate_limit
+
+
+async def post(app, path : str, body : bytes, content_type : bytes):
+    """ Runs one POST through the app, returns the status and the decoded body """
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+             "headers": [(b"host", b"benchmark"), (b"content-type", content_type),
+                         (b"content-length", str(len(body)).encode())],
+             "client": ("127.0.0.1", 0), "server": ("benchmark", 80)}
+    status = None
+    chunks = []
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    return status, json.loads(b"".join(chunks))
+
+
+async def login(app, email : str, password : str, role : int):
+    body = urlencode({"username": email, "password": password}).encode()
+    status, content = await post(app, f"/user_email_login?role={role}", body, b"application/x-www-form-urlencoded")
+    if status != 200:
+        raise RuntimeError(f"login returned {status}: {content}")
+    return content["detail"]["data"]
+
+
+async def refresh(app, refresh_token : str):
+    body = json.dumps({"refresh_token": refresh_token}).encode()
+    status, content = await post(app, "/token/refresh", body, b"application/json")
+    if status != 200:
+        raise RuntimeError(f"refresh returned {status}: {content}")
+    return content["detail"]["data"]
+
+
+async def measure(app, args):
+    """ Latencies in milliseconds of the logins and of the refreshes """
+    login_latencies, refresh_latencies, tokens = [], [], []
+    for _ in range(args.logins):
+        start = time.perf_counter()
+        tokens.append(await login(app, args.email, args.password, args.role))
+        login_latencies.append((time.perf_counter() - start) * 1000)
+    refresh_token = tokens[-1]["refresh_token"]
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        refresh_token = (await refresh(app, refresh_token))["refresh_token"]
+        refresh_latencies.append((time.perf_counter() - start) * 1000)
+    await revoke(tokens)
+    return login_latencies, refresh_latencies
+
+
+async def revoke(tokens):
+    """ Revokes the refresh tokens of every benchmark login, as /user/logout does """
+    from core.api.sales_person import crud
+    from core.database.connection import async_session_local
+    from core.jwt import auth_handler
+
+    now = datetime.datetime.utcnow()
+    async with async_session_local() as db:
+        for token in tokens:
+            await crud.revoke_refresh_family(db = db, family_id = auth_handler.decode_token(token["access_token"])["fid"], now = now)
+        await db.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure /token/refresh against /user_email_login")
+    parser.add_argument("--email", required=True, help="an existing user of the role")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--role", type=int, default=6)
+    parser.add_argument("--logins", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=300, help="refreshes")
+    args = parser.parse_args(argv)
+
+    from main import app
+
+    app.dependency_overrides[rate_limit.login_ip_limit] = lambda: None
+    app.dependency_overrides[rate_limit.login_email_limit] = lambda: None
+    try:
+        login_latencies, refresh_latencies = asyncio.run(measure(app, args))
+    finally:
+        app.dependency_overrides.clear()
+    database = make_url(settings.ASYNC_DB_URL).render_as_string(hide_password=True)
+    print(f"{args.logins} logins and {args.requests} refreshes of {args.email} on {database}")
+    print(f"{'endpoint':<20} {'req/s':>8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, latencies in [("/user_email_login", login_latencies), ("/token/refresh", refresh_latencies)]:
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{label:<20} {1000 / statistics.mean(latencies):>8.1f} {statistics.mean(latencies):>8.2f} "
+              f"{statistics.median(latencies):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
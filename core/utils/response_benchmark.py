@@ -0,0 +1,96 @@
+"""
+Measures serialization of a display_all_sales_person page.
+
+    python -m core.utils.response_benchmark --rows 1000
+
+Loads --rows rows of sales_person_query from an in-memory SQLite database
+and serializes the page body the way the handler returns it, once through
+jsonable_encoder and JSONResponse, as FastAPI does for a returned dict, and
+once through success_response, which hands the rows straight to orjson.
+Prints the time per page and rows per second of each, best of --repeat runs.
+"""
+import argparse
+import datetime
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import MetaData, create_engine, insert
+
+from core.api.admin.crud import sales_person_export_query
+from core.api.sales_person.models import Roles, SalesPersonProfile, UserRoles, Users
+from core.utils.responses import success_response
+
+message = "Sales person profiles"
+
+
+def load_rows(rows : int):
+    """ rows Rows of sales_person_query, the columns display_all_sales_person returns """
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    tables = [table.to_metadata(metadata) for table in (Users.__table__, Roles.__table__, UserRoles.__table__, SalesPersonProfile.__table__)]
+    # SQLite can not autoincrement the composite key of user_roles, ids are given below
+    metadata.tables["user_roles"].c.id.autoincrement = False
+    metadata.create_all(engine, tables=tables)
+    created = datetime.datetime(2023, 1, 1, 10, 11, 12, 123456)
+    with engine.begin() as conn:
+        conn.execute(insert(Users), [
+            {"id": i, "full_name": f"Sales Person {i}", "email": f"sales{i}@example.com", "password": "x",
+             "phone_number": f"9876{i:06d}", "referral_code": f"R{i:06d}", "blocked": False, "deleted": False,
+             "created_at": created, "updated_at": created}
+            for i in range(1, rows + 1)])
+        conn.execute(insert(UserRoles), [
+            {"id": i, "users_id": i, "role_id": 6, "created_at": created, "updated_at": created}
+            for i in range(1, rows + 1)])
+        conn.execute(insert(SalesPersonProfile), [
+            {"id": i, "users_id": i, "dob": datetime.date(1990, 5, i % 28 + 1), "gender": "FEMALE",
+             "address1": f"Street {i}", "address2": f"Block {i}", "city": "Chennai", "district": "Chennai",
+             "state": "TN", "country": "India", "postal_code": f"600{i % 1000:03d}", "designation": "Executive",
+             "created_at": created, "updated_at": created}
+            for i in range(1, rows + 1)])
+    with engine.connect() as conn:
+        items = conn.execute(sales_person_export_query().limit(rows)).all()
+    engine.dispose()
+    return items
+
+
+def render_encoder(items) -> bytes:
+    content = {"detail": {"status": "Success", "status_code": 200,
+                          "data": {"status_code": 200, "status": "Success", "message": message, "profile": items},
+                          "error": None}}
+    return JSONResponse(content = jsonable_encoder(content)).body
+
+
+def render_orjson(items) -> bytes:
+    return success_response(message, profile = items).body
+
+
+def measure(render, items, repeat : int) -> float:
+    """ Best seconds per page """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(items)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure serialization of a sales person page")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    items = load_rows(args.rows)
+    if json.loads(render_encoder(items)) != json.loads(render_orjson(items)):
+        raise RuntimeError("orjson and jsonable_encoder bodies differ")
+    print(f"page of {len(items)} rows, {len(render_orjson(items))} bytes, best of {args.repeat}")
+    print(f"{'serializer':<26} {'ms/page':>8} {'rows/s':>10}")
+    for label, render in [("jsonable_encoder + json", render_encoder), ("orjson", render_orjson)]:
+        seconds = measure(render, items, args.repeat)
+        print(f"{label:<26} {seconds * 1e3:>8.2f} {len(items) / seconds:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
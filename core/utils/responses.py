@@ -0,0 +1,63 @@
+"""
+JSON responses serialized with orjson.
+
+APIResponse is the default response class of the app. Handlers that return
+one directly, e.g. through success_response, skip FastAPI's
+jsonable_encoder: orjson writes dicts, lists, dates, times, enums and uuids
+itself and only calls default for SQLAlchemy rows and model instances.
+The output matches what jsonable_encoder produced for the same content.
+"""
+import datetime
+import decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+
+def default(obj) -> Any:
+    # Row of a select() of columns
+    mapping = getattr(obj, "_mapping", None)
+    if mapping is not None:
+        return dict(mapping)
+    # ORM instance, its loaded columns without the SQLAlchemy state
+    if hasattr(obj, "_sa_instance_state"):
+        return {key: value for key, value in vars(obj).items() if not key.startswith("_sa")}
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    import orjson
+    return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class APIResponse(JSONResponse):
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def success_response(message : str, status_code : int = 200, status : str = "Success", **data) -> APIResponse:
+    """ The success envelope, data are the fields next to the message """
+    return APIResponse(
+        status_code = status_code,
+        content = {
+            "detail": {
+                "status": "Success",
+                "status_code": status_code,
+                "data": {
+                    "status_code": status_code,
+                    "status": status,
+                    "message": message,
+                    **data
+                },
+                "error": None
+            }
+        }
+    )
+
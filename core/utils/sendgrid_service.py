@@ -2,9 +2,6 @@
 # https://github.com/sendgrid/sendgrid-python
 import os
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-
 from config.base import settings
 from core.utils.otp_and_password_html import create_otp_template
 
@@ -29,6 +26,8 @@ def send_email(to_email, title=None, subject=None, action=None, message1=None, m
       res : Response object
    """
    
+   from sendgrid import SendGridAPIClient
+
    send_grid = SendGridAPIClient(api_key=sendgrid_key)
    html_content = create_otp_template(title=title, subject=subject, action=action, message1=message1, message2=message2, action_url=action_url, support_url=support_url)
    data = format_mail_data(to_email, subject, html_content)
@@ -1,5 +1,6 @@
 from multiprocessing import cpu_count
 from config.base import settings
+from core.database.engine import connection_budget, connections_per_worker
 
 
 
@@ -11,7 +12,7 @@ reload_engine = 'auto'
 
 # Worker Options
 
-workers = cpu_count() + 1
+workers = settings.GUNICORN_WORKERS or cpu_count() + 1
 
 worker_class = 'uvicorn.workers.UvicornWorker'
 
@@ -26,3 +27,14 @@ accesslog = f'{settings.PROJECT_HOME}/access.log'
 errorlog =  f'{settings.PROJECT_HOME}/error.log'
 
 
+
+# Server Hooks
+
+def on_starting(server):
+    budget = connection_budget(workers)
+    message = (f"database connection budget: {workers} workers x {connections_per_worker()} connections "
+               f"= {budget} of max_connections {settings.DB_MAX_CONNECTIONS}")
+    if budget > settings.DB_MAX_CONNECTIONS:
+        server.log.error(message + ", lower DB_POOL_SIZE/DB_MAX_OVERFLOW or GUNICORN_WORKERS")
+    else:
+        server.log.info(message)
@@ -1,3 +1,5 @@
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI,  Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,10 +10,16 @@ from config.base import settings
 from core.api.sales_person import sales_person_api
 from core.api.super_admin import super_admin_api
 from core.api.admin import admin_api
-from core.database.connection import get_db, Base, engine
+from core.database.connection import get_db, Base, engine, close_mongo
+from core.database.replicas import StickyReadMiddleware
+from core.database.schema import prepare_database
 from core.models.models import Country, IDProofs
+from core.utils.file_storage import UploadLimitMiddleware
+from core.utils.email_outbox import run_outbox_worker
+from core.jwt.revocation import run_revocation_refresher
+from core.utils.responses import APIResponse
 
-app = FastAPI()
+app = FastAPI(default_response_class=APIResponse)
 
 origins = ["http://localhost:5000"]
 
@@ -23,12 +31,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
+app.add_middleware(StickyReadMiddleware)
+
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_body_size=settings.UPLOAD_MAX_BYTES + settings.UPLOAD_FORM_OVERHEAD_BYTES,
+)
 
 app.include_router(sales_person_api.router)
 app.include_router(super_admin_api.router)
 app.include_router(admin_api.router)
 
+@app.on_event("startup")
+async def startup():
+    await prepare_database()
+    app.state.background_stop = asyncio.Event()
+    app.state.background_tasks = [asyncio.create_task(run_revocation_refresher(app.state.background_stop))]
+    if settings.EMAIL_WORKER_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(run_outbox_worker(app.state.background_stop)))
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.background_stop.set()
+    await asyncio.gather(*app.state.background_tasks)
+    close_mongo()
+
 @app.get("/")
 async def home():
     return {"XPayBack CRM APIs"}
@@ -0,0 +1,45 @@
+"""
+Startup cost of importing the app, measured with python -X importtime.
+
+The integrations below are imported on first use, a worker that never
+touches images, mail or passwords must not load them. The budget applies
+to the cumulative import time of main, IMPORT_TIME_BUDGET_MS overrides it
+for slower machines.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+root = Path(__file__).resolve().parent.parent
+
+lazy_modules = ["pymongo", "gridfs", "sendgrid", "phonenumbers", "passlib.context", "jose.jwt"]
+
+budget_ms = float(os.environ.get("IMPORT_TIME_BUDGET_MS", 1500))
+
+
+@pytest.fixture(scope="module")
+def import_times():
+    """ Cumulative import time in microseconds of every module imported by main """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", lazy_modules)
+def test_integration_not_imported(import_times, module):
+    assert module not in import_times, f"importing main loads {module}, it should only be imported on first use"
+
+
+def test_import_time_within_budget(import_times):
+    elapsed_ms = import_times["main"] / 1000
+    assert elapsed_ms <= budget_ms, f"importing main took {elapsed_ms:.0f} ms, budget {budget_ms:.0f} ms"